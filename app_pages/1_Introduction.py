@@ -1,9 +1,5 @@
-import pandas as pd
 import streamlit as st
 
-# Access the cached data from session_state
-df = st.session_state["df"]
-
 # Introduction page content
 st.title("Philippine Food Prices Data Exploration")
 st.write(
@@ -26,6 +22,8 @@ This dashboard allows you to:
 - **Retail vs Wholesale Price Comparison**: Analyze the differences between retail and wholesale prices.
 - **Top 5**: Discover which commodities have the highest and lowest average prices.
 - **Price Trends Over Time**: Visualize how prices have changed yearly.
+- **Cohort Comparison**: Define named groups of regions, commodities and price types, such as Luzon against Mindanao, and compare their prices and trends side by side.
+- **Market Map**: See average and latest commodity prices market by market, or rolled up into map grid cells.
  
 ## Descriptive Statistics
 In addition to visual exploration, the dashboard provides **descriptive statistics** for deeper insight into the dataset. This includes:
@@ -42,15 +40,19 @@ st.write("---")
 st.write(
     """
 ### How to Use This Dashboard
-To begin exploring, use the **filters on the sidebar** to choose specific regions and commodities. The interactive charts and statistics will update automatically, allowing you to uncover key insights and trends in real-time.
+To begin exploring, use the **filters on the sidebar** to choose specific regions and commodities. The interactive charts and statistics will update automatically, allowing you to uncover key insights and trends in real-time. On the Visualization page, the **Prices** option compares commodities per kilogram, litre or piece, optionally adjusted for inflation.
  
 ### Sample of the Dataset:
 Below is a sample preview of the dataset used for this exploration:
 """
 )
 
-# Display first few rows of the dataset
-st.dataframe(df.head())
+# The data caches are imported here, after the text above has been sent, so the
+# page paints while the dataset finishes loading in the background
+from utils.cache import get_dataset  # noqa: E402
+
+# Display first few rows of the dataset shared by all sessions
+st.dataframe(get_dataset().head())
 
 # Additional instructions for users
 st.write(
@@ -1,62 +1,103 @@
-import pandas as pd
-import plotly.express as px
 import streamlit as st
 from streamlit_extras.metric_cards import style_metric_cards
 
-# Access the cached data from session_state
-df = st.session_state["df"]
-
-# Rename columns for user-friendly display
-df_display = df.rename(
-    columns={
-        "#adm1+name": "Region",
-        "#item+name": "Commodity",
-        "#value": "Price (PHP)",
-        "#item+type": "Commodity Type",
-        "#item+price+type": "Price Type",
-        "#date": "Date",
-    }
+from utils.cache import (
+    derived,
+    forecast_version,
+    get_cube,
+    get_display_dataset,
+    get_filter_index,
+    get_forecasts,
+    get_margins,
+    get_price_series,
+    get_sketch,
+    get_volatility,
+)
+from utils.charts import (
+    RANKING_VIEWS,
+    average_price,
+    category_distribution,
+    category_figure,
+    commodity_price_figure,
+    commodity_ranking,
+    latest_changes,
+    markup_box_figure,
+    markup_trend_figure,
+    median_price,
+    price_type_figure,
+    ranking_figure,
+    region_commodity_figure,
+    regional_price_figure,
+    trend_figure,
+    volatility_figure,
+    yoy_figure,
+)
+from utils.data import DISPLAY_NAMES
+from utils.forecast import selection_forecast
+from utils.margins import aligned_prices, markup_distribution, markup_trend
+from utils.metrics import RerunTimer
+from utils.timeseries import GRANULARITIES
+from utils.volatility import MIN_RETURNS, RANKING_MEASURES
+from utils.widgets import (
+    error_bound_caption,
+    exact_statistics_toggle,
+    price_basis_caption,
+    price_basis_selector,
+    sidebar_filters,
 )
 
-# Sidebar filters with "ALL" option
-region_options = ["ALL"] + sorted(df_display["Region"].unique())
-commodity_options = ["ALL"] + sorted(df_display["Commodity"].unique())
+# Stage timings and payload sizes of this rerun
+timer = RerunTimer("Food Prices Visualization")
 
-# Allow multiselect for Regions and Commodities with "ALL" option
-regions_selected = st.sidebar.multiselect(
-    "Select Region",
-    region_options,
-    default="ALL",
-    help="Filter report to show all regions or select multiple regions",
-)
+# Price column the charts average: as reported, per standard unit, or deflated
+value_column = price_basis_selector()
 
-commodities_selected = st.sidebar.multiselect(
-    "Select Commodity",
-    commodity_options,
-    default="ALL",
-    help="Filter report to show all commodities or select multiple commodities",
-)
+with timer.stage("data"):
+    # Access the shared dataset with user-friendly column names
+    df_display = get_display_dataset()
+
+    # Pre-aggregated cube of the selected price column for the chart group-bys
+    cube = get_cube(value_column)
 
-# Apply filters based on user selections, considering "ALL" option
-df_filtered = df_display.copy()
-if "ALL" not in regions_selected:
-    df_filtered = df_filtered[df_filtered["Region"].isin(regions_selected)]
+# Sidebar filters; charts read the cube, row-level statistics read the index
+regions_selected, commodities_selected, filters = sidebar_filters(cube)
+exact = exact_statistics_toggle()
 
-if "ALL" not in commodities_selected:
-    df_filtered = df_filtered[df_filtered["Commodity"].isin(commodities_selected)]
 
 # Display key metrics using st.metric and st.info
 st.markdown("## Key Metrics")
 kpi2, kpi3 = st.columns(2)
 
-avg_price = df_filtered["Price (PHP)"].mean()
-median_price = df_filtered["Price (PHP)"].median()
+# Metrics, chart data and figures are shared across reruns and sessions through
+# the derived-result cache, keyed on the canonical filter state
+with timer.stage("aggregation"):
+    avg_price = derived(
+        "average_price",
+        filters,
+        lambda: average_price(cube, [], filters)["Price (PHP)"].iloc[0],
+        value_column,
+    )
+    # The exact median needs the filtered rows, but only on a cache miss
+    median = derived(
+        "median_price",
+        filters,
+        lambda: median_price(
+            get_sketch(value_column),
+            filters,
+            get_filter_index().apply(df_display, filters) if exact else None,
+            DISPLAY_NAMES[value_column],
+        ),
+        exact,
+        value_column,
+    )
 
 kpi2.info("Average Price", icon="\U0001F4CA")
 kpi2.metric("Average PHP", f"{avg_price:,.0f}")
 
 kpi3.info("Median Price", icon="\U0001F4C8")
-kpi3.metric("Median PHP", f"{median_price:,.0f}")
+kpi3.metric("Median PHP", f"{median:,.0f}")
+kpi3.caption(error_bound_caption(exact))
+st.caption(price_basis_caption(value_column))
 
 # Add a section title and description for each visualization
 st.markdown("## Visualizations")
@@ -68,102 +109,148 @@ st.write(
     "If you filter by region or commodity, the chart will adjust to show the distribution within that subset."
 )
 
-category_distribution = df_filtered["Commodity Type"].value_counts().reset_index()
-category_distribution.columns = ["Category", "Count"]
-
-# Pie chart with sorted categories and percentage labels
-pie_chart = px.pie(
-    category_distribution,
-    values="Count",
-    names="Category",
-    title="Proportion of Food Categories",
-    hole=0.4,
-)
-pie_chart.update_traces(textinfo="percent+label", sort=True)
-st.plotly_chart(pie_chart, use_container_width=True)
+with timer.stage("aggregation"):
+    category_counts = derived(
+        "category_distribution",
+        filters,
+        lambda: category_distribution(cube, filters),
+        value_column,
+    )
+with timer.stage("figure"):
+    pie_chart = derived(
+        "category_figure",
+        filters,
+        lambda: category_figure(category_counts),
+        value_column,
+    )
+timer.plotly_chart(pie_chart, use_container_width=True)
 
 # 2. Regional and Commodity Price Breakdown
 if len(regions_selected) > 1 and len(commodities_selected) > 1:
     st.markdown("### Price Breakdown for Selected Regions and Commodities")
-    price_breakdown = (
-        df_filtered.groupby(["Region", "Commodity"])["Price (PHP)"].mean().reset_index()
-    )
-
-    price_breakdown_chart = px.bar(
-        price_breakdown,
-        x="Region",
-        y="Price (PHP)",
-        color="Commodity",
-        barmode="group",
-        title="Average Price by Region and Commodity",
-        labels={
-            "Region": "Region",
-            "Price (PHP)": "Price (PHP)",
-            "Commodity": "Commodity",
-        },
-    )
-    st.plotly_chart(price_breakdown_chart, use_container_width=True)
+    with timer.stage("aggregation"):
+        price_breakdown = derived(
+            "region_commodity_prices",
+            filters,
+            lambda: average_price(cube, ["#adm1+name", "#item+name"], filters),
+            value_column,
+        )
+    with timer.stage("figure"):
+        price_breakdown_chart = derived(
+            "region_commodity_figure",
+            filters,
+            lambda: region_commodity_figure(price_breakdown),
+            value_column,
+        )
+    timer.plotly_chart(price_breakdown_chart, use_container_width=True)
 
 # 3. Regional Price Breakdown for Selected Commodity
 if len(regions_selected) > 1 and len(commodities_selected) == 1:
     st.markdown("### Regional Price Breakdown for Selected Commodity")
-    regional_price_breakdown = (
-        df_filtered.groupby(["Region"])["Price (PHP)"].mean().reset_index()
-    )
-
-    regional_price_chart = px.bar(
-        regional_price_breakdown,
-        x="Region",
-        y="Price (PHP)",
-        title=f"Average Price of {commodities_selected[0]} by Region",
-        labels={"Region": "Region", "Price (PHP)": "Price (PHP)"},
-    )
-    st.plotly_chart(regional_price_chart, use_container_width=True)
+    with timer.stage("aggregation"):
+        regional_price_breakdown = derived(
+            "regional_prices",
+            filters,
+            lambda: average_price(cube, ["#adm1+name"], filters),
+            value_column,
+        )
+    with timer.stage("figure"):
+        regional_price_chart = derived(
+            "regional_price_figure",
+            filters,
+            lambda: regional_price_figure(
+                regional_price_breakdown, commodities_selected[0]
+            ),
+            value_column,
+        )
+    timer.plotly_chart(regional_price_chart, use_container_width=True)
 
 # 4. Commodity Price Comparison for Selected Region
 if len(regions_selected) == 1 and len(commodities_selected) > 1:
     st.markdown("### Commodity Price Comparison for Selected Region")
-    commodity_price_breakdown = (
-        df_filtered.groupby(["Commodity"])["Price (PHP)"].mean().reset_index()
-    )
-
-    commodity_price_chart = px.bar(
-        commodity_price_breakdown,
-        x="Commodity",
-        y="Price (PHP)",
-        title=f"Average Price of Commodities in {regions_selected[0]}",
-        labels={"Commodity": "Commodity", "Price (PHP)": "Price (PHP)"},
-    )
-    st.plotly_chart(commodity_price_chart, use_container_width=True)
+    with timer.stage("aggregation"):
+        commodity_price_breakdown = derived(
+            "commodity_prices",
+            filters,
+            lambda: average_price(cube, ["#item+name"], filters),
+            value_column,
+        )
+    with timer.stage("figure"):
+        commodity_price_chart = derived(
+            "commodity_price_figure",
+            filters,
+            lambda: commodity_price_figure(
+                commodity_price_breakdown, regions_selected[0]
+            ),
+            value_column,
+        )
+    timer.plotly_chart(commodity_price_chart, use_container_width=True)
 
 # 5. Comparison of Retail vs Wholesale Prices
 st.markdown("### Retail vs Wholesale Price Comparison")
 st.write(
-    "This chart compares the average retail and wholesale prices for selected commodities and regions. "
-    "It helps to understand how prices differ between the two markets."
+    "These charts compare retail and wholesale prices only where both were reported for the same "
+    "commodity, unit, region and month, so the gap between them is a like-for-like margin. "
+    "The markup is the retail price divided by the wholesale price."
 )
 
-retail_vs_wholesale = (
-    df_filtered.groupby(["Price Type", "Commodity"])["Price (PHP)"].mean().reset_index()
-)
+# Aligned pairs are built once per dataset version and price basis; filters only
+# select from them
+with timer.stage("data"):
+    margins = get_margins(value_column)
+with timer.stage("aggregation"):
+    retail_vs_wholesale = derived(
+        "aligned_prices",
+        filters,
+        lambda: aligned_prices(margins, filters),
+        value_column,
+    )
 
-retail_vs_wholesale_chart = px.bar(
-    retail_vs_wholesale,
-    x="Commodity",
-    y="Price (PHP)",
-    color="Price Type",
-    barmode="group",
-    title="Average Retail vs Wholesale Prices by Commodity",
-    labels={
-        "Commodity": "Commodity",
-        "Price (PHP)": "Price (PHP)",
-        "Price Type": "Price Type",
-    },
-)
-retail_vs_wholesale_chart.update_layout(
-    plot_bgcolor="rgba(0,0,0,0)", xaxis_title="Commodity", yaxis_title="Price (PHP)"
-)
-st.plotly_chart(retail_vs_wholesale_chart, use_container_width=True)
+if retail_vs_wholesale.empty:
+    st.info(
+        "No commodity in the selection has retail and wholesale prices for the same month."
+    )
+else:
+    with timer.stage("figure"):
+        retail_vs_wholesale_chart = derived(
+            "price_type_figure",
+            filters,
+            lambda: price_type_figure(retail_vs_wholesale),
+            value_column,
+        )
+    timer.plotly_chart(retail_vs_wholesale_chart, use_container_width=True)
+
+    with timer.stage("aggregation"):
+        markups = derived(
+            "markup_distribution",
+            filters,
+            lambda: markup_distribution(margins, filters),
+            value_column,
+        )
+        markup_history = derived(
+            "markup_trend",
+            filters,
+            lambda: markup_trend(margins, filters),
+            value_column,
+        )
+    with timer.stage("figure"):
+        markup_chart = derived(
+            "markup_box_figure",
+            filters,
+            lambda: markup_box_figure(markups),
+            value_column,
+        )
+        markup_trend_chart = derived(
+            "markup_trend_figure",
+            filters,
+            lambda: markup_trend_figure(markup_history),
+            value_column,
+        )
+    m1, m2 = st.columns(2)
+    with m1:
+        timer.plotly_chart(markup_chart, use_container_width=True)
+    with m2:
+        timer.plotly_chart(markup_trend_chart, use_container_width=True)
 
 # 6. Commodity Price Insights (Top 5 and Bottom 5)
 st.markdown("### Commodity Price Insights")
@@ -172,51 +259,195 @@ st.write(
     "This helps identify the most expensive and most affordable commodities in the selected regions."
 )
 
-option = st.selectbox("Select View", ["Top 5 Commodities", "Bottom 5 Commodities"])
+option = st.selectbox("Select View", RANKING_VIEWS)
 
-if option == "Top 5 Commodities":
-    top_commodities = (
-        df_filtered.groupby("Commodity")["Price (PHP)"].mean().nlargest(5).reset_index()
+with timer.stage("aggregation"):
+    top_commodities = derived(
+        "commodity_ranking",
+        filters,
+        lambda: commodity_ranking(cube, filters, option),
+        option,
+        value_column,
     )
-    st.write("Top 5 Commodities by Average Price")
-else:
-    top_commodities = (
-        df_filtered.groupby("Commodity")["Price (PHP)"]
-        .mean()
-        .nsmallest(5)
-        .reset_index()
-    )
-    st.write("Bottom 5 Commodities by Average Price")
-
-top_commodities_chart = px.bar(
-    top_commodities,
-    x="Commodity",
-    y="Price (PHP)",
-    title=f"{option} by Average Price",
-    labels={"Commodity": "Commodity", "Price (PHP)": "Average Price (PHP)"},
-)
-st.plotly_chart(top_commodities_chart, use_container_width=True)
+st.write(f"{option} by Average Price")
+
+with timer.stage("figure"):
+    top_commodities_chart = derived(
+        "ranking_figure",
+        filters,
+        lambda: ranking_figure(top_commodities, option),
+        option,
+        value_column,
+    )
+timer.plotly_chart(top_commodities_chart, use_container_width=True)
 
 # 7. Price Trend Over Time
 st.markdown("### Price Trend Over Time")
 st.write(
     "This chart shows how prices have changed over time based on the selected filters. "
-    "The chart displays yearly trends to provide a clearer view of long-term changes."
+    "Choose a monthly, quarterly or yearly view; the dashed line is a rolling mean "
+    "and the bars below show the change against the same period a year earlier. "
+    "Crosses mark periods in which at least one selected market series had an unusually large "
+    "month-over-month price change; hover over a cross for how many."
 )
 
-# Resample data for yearly granularity
-df_filtered["Date"] = pd.to_datetime(df_filtered["Date"])
-price_trend = df_filtered.resample("Y", on="Date")["Price (PHP)"].mean().reset_index()
-
-price_trend_fig = px.line(
-    price_trend,
-    x="Date",
-    y="Price (PHP)",
-    title="Price Trend Over Time (Yearly)",
-    labels={"Date": "Date", "Price (PHP)": "Average Price (PHP)"},
-    markers=True,
+granularity = st.radio(
+    "Granularity", list(GRANULARITIES), index=2, horizontal=True, key="granularity"
 )
-st.plotly_chart(price_trend_fig, use_container_width=True)
+
+# Roll the precomputed monthly series up to the selected granularity
+with timer.stage("data"):
+    price_series = get_price_series(value_column)
+with timer.stage("aggregation"):
+    price_trend = derived(
+        "price_trend",
+        filters,
+        lambda: price_series.trend(filters, granularity),
+        granularity,
+        value_column,
+    )
+
+# Periods in which the volatility engine flagged selected market series
+with timer.stage("data"):
+    volatility = get_volatility()
+with timer.stage("aggregation"):
+    spike_counts = derived(
+        "spike_counts",
+        filters,
+        lambda: volatility.spike_counts(filters, granularity),
+        granularity,
+    )
+
+# Monthly view of reported prices adds the batch forecast of the selection,
+# when one has been run
+forecast = None
+if granularity == "Monthly" and value_column == "#value":
+    with timer.stage("data"):
+        forecasts = get_forecasts()
+    with timer.stage("aggregation"):
+        forecast = derived(
+            "selection_forecast",
+            filters,
+            lambda: selection_forecast(forecasts, price_series, filters),
+            forecast_version(),
+        )
+
+with timer.stage("figure"):
+    price_trend_fig = derived(
+        "trend_figure",
+        filters,
+        lambda: trend_figure(price_trend, granularity, forecast, spike_counts),
+        granularity,
+        forecast_version(),
+        value_column,
+    )
+timer.plotly_chart(price_trend_fig, use_container_width=True)
+if forecast is not None:
+    st.caption(
+        "The forecast is a linear trend with monthly seasonality fitted to each series' last "
+        "ten years of log prices, combined across the selection; the band is a 95% prediction interval."
+    )
+
+with timer.stage("figure"):
+    yoy_fig = derived(
+        "yoy_figure",
+        filters,
+        lambda: yoy_figure(price_trend, granularity),
+        granularity,
+        value_column,
+    )
+timer.plotly_chart(yoy_fig, use_container_width=True)
+
+with st.expander("Latest year-over-year change by series"):
+    with timer.stage("aggregation"):
+        changes = derived(
+            "latest_changes",
+            filters,
+            lambda: latest_changes(price_series, filters),
+            value_column,
+        )
+    timer.dataframe(
+        changes,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "Latest Month": st.column_config.DateColumn(format="MMM YYYY"),
+            "YoY Change": st.column_config.NumberColumn(format="%.1f%%"),
+        },
+    )
+
+# 8. Price Volatility
+st.markdown("### Price Volatility")
+st.write(
+    "This chart ranks commodities by how much their prices move from month to month, using the "
+    "median over each commodity's market series: the standard deviation of monthly log returns, "
+    "or the coefficient of variation of prices. "
+    f"Only series with at least {MIN_RETURNS} monthly changes are ranked."
+)
+# The per-market table behind volatility holds prices as reported only
+if value_column != "#value":
+    st.caption(
+        "Volatility is measured on prices as reported, whichever Prices option is selected."
+    )
+
+measure = st.radio("Rank by", list(RANKING_MEASURES), horizontal=True)
+
+# The volatility engine was loaded for the trend chart's spike markers
+with timer.stage("aggregation"):
+    commodity_volatility = derived(
+        "commodity_volatility",
+        filters,
+        lambda: volatility.commodity_volatility(filters, RANKING_MEASURES[measure]),
+        measure,
+    )
+
+if commodity_volatility.empty:
+    st.info("Not enough monthly history in the selection to rank volatility.")
+else:
+    with timer.stage("figure"):
+        volatility_chart = derived(
+            "volatility_figure",
+            filters,
+            lambda: volatility_figure(commodity_volatility, measure),
+            measure,
+        )
+    timer.plotly_chart(volatility_chart, use_container_width=True)
+
+    with st.expander("Most volatile market series"):
+        with timer.stage("aggregation"):
+            most_volatile = derived(
+                "most_volatile",
+                filters,
+                lambda: volatility.most_volatile(
+                    filters, RANKING_MEASURES[measure], n=25
+                ).rename(columns=DISPLAY_NAMES),
+                measure,
+            )
+        timer.dataframe(
+            most_volatile,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "observations": st.column_config.NumberColumn("Months observed"),
+                "returns": None,
+                "mean_price": st.column_config.NumberColumn(
+                    "Mean Price (PHP)", format="%.2f"
+                ),
+                "cv": st.column_config.NumberColumn(
+                    "Coefficient of Variation", format="%.3f"
+                ),
+                "volatility": st.column_config.NumberColumn(
+                    "Return Volatility", format="%.3f"
+                ),
+                "latest_volatility": st.column_config.NumberColumn(
+                    "Latest 12-Month Volatility", format="%.3f"
+                ),
+                "spikes": st.column_config.NumberColumn("Flagged Spikes"),
+                "last_spike": st.column_config.DateColumn(
+                    "Last Spike", format="MMM YYYY"
+                ),
+            },
+        )
 
 # Apply styles to metric cards
 style_metric_cards(
@@ -225,3 +456,6 @@ style_metric_cards(
     border_color="#000000",
     box_shadow="#F71938",
 )
+
+# Record this rerun's timings (and show them when the developer panel is on)
+timer.finish()
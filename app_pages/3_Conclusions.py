@@ -12,11 +12,11 @@ Our analysis of **Philippine Food Prices** from 2000 to 2024 has revealed key in
 - **Price Trends Over Time**: Price trends, whether viewed daily, monthly, quarterly, or yearly, indicate that fluctuations are more pronounced during certain periods, possibly due to seasonal changes, supply chain disruptions, or global market influences.
 
 ## Key Takeaways
-- **Commodity-Specific Insights**: Commodities such as seafood, meat, and bananas show high sensitivity to price changes, making them candidates for more detailed analysis to help better understand price drivers.
+- **Commodity-Specific Insights**: Commodities such as seafood, meat, and bananas show high sensitivity to price changes, making them candidates for more detailed analysis to help better understand price drivers. The **Price Volatility** section of the visualization page measures this directly, ranking commodities by the volatility of their monthly price changes across markets and flagging unusual price spikes.
 - **Regional Disparities**: Prices in certain regions are consistently higher, highlighting the need for targeted policies or market interventions to address these discrepancies and improve food affordability.
   
 ## Recommendations for Future Work
-- **Time Series Forecasting**: Implementing time-series forecasting models (e.g., ARIMA) could help predict future price trends and allow for better planning to mitigate price fluctuations, particularly in volatile regions.
+- **Time Series Forecasting**: The monthly price trend now shows a twelve-month forecast from a seasonal trend model fitted to every series. Richer models (e.g., ARIMA) could tighten these forecasts and allow for better planning to mitigate price fluctuations, particularly in volatile regions.
 - **Deeper Commodity-Specific Analysis**: High-priced commodities like seafood and meat should undergo further analysis to uncover supply chain inefficiencies or other factors affecting their prices.
 - **Policy Recommendations**: Insights into regional disparities could guide policymakers in focusing efforts on regions where food prices are consistently higher, helping to ensure food affordability across the country.
 
@@ -0,0 +1,163 @@
+import pydeck as pdk
+import streamlit as st
+
+from utils.cache import derived, get_markets
+from utils.markets import grid_cells, market_prices, price_colors
+from utils.metrics import RerunTimer
+
+# Stage timings and payload sizes of this rerun
+timer = RerunTimer("Market Map")
+
+# Per-market monthly aggregates; the map only ever receives one row per market
+# (or per grid cell), never the raw observations
+with timer.stage("data"):
+    market_table = get_markets()
+
+st.write(
+    "This map shows the average price of a commodity in each market over the selected period, "
+    "or its price in the latest month each market reported. Switch to the grid view to "
+    "compare areas rather than individual markets."
+)
+
+# Commodity, price type and period selection
+c1, c2 = st.columns(2)
+commodities = sorted(market_table["#item+name"].unique())
+commodity = c1.selectbox("Select Commodity", commodities)
+price_types = sorted(
+    market_table.loc[market_table["#item+name"] == commodity, "#item+price+type"]
+    .unique()
+    .tolist()
+)
+price_type = c2.radio("Price Type", price_types, horizontal=True)
+
+months = sorted(market_table["month"].unique())
+start, end = st.select_slider(
+    "Period",
+    options=months,
+    value=(months[0], months[-1]),
+    format_func=lambda month: month.strftime("%b %Y"),
+)
+
+v1, v2, v3 = st.columns(3)
+price_label = v1.radio(
+    "Price", ["Average Price", "Latest Price"], horizontal=True, key="map_price"
+)
+view = v2.radio("View", ["Markets", "Grid"], horizontal=True, key="map_view")
+cell_degrees = v3.select_slider(
+    "Grid cell size (degrees)",
+    options=[0.25, 0.5, 1.0, 2.0],
+    value=0.5,
+    disabled=view != "Grid",
+)
+price_column = "average_price" if price_label == "Average Price" else "latest_price"
+
+filters = {"#item+name": [commodity], "#item+price+type": [price_type]}
+with timer.stage("aggregation"):
+    markets = derived(
+        "market_prices",
+        filters,
+        lambda: market_prices(market_table, filters, start, end),
+        start,
+        end,
+    )
+
+if markets.empty:
+    st.warning("No located market reported this commodity in the selected period.")
+    timer.finish()
+    st.stop()
+
+# Markets are shared through the derived-result cache, so layers get new frames
+with timer.stage("figure"):
+    if view == "Markets":
+        layer_data = markets.assign(
+            color=price_colors(markets[price_column]),
+            average_label=markets["average_price"].map("{:,.2f}".format),
+            latest_label=markets["latest_price"].map("{:,.2f}".format),
+            month_label=markets["latest_month"].dt.strftime("%b %Y"),
+        )
+        layer = pdk.Layer(
+            "ScatterplotLayer",
+            data=layer_data[
+                [
+                    "market",
+                    "region",
+                    "lon",
+                    "lat",
+                    "color",
+                    "average_label",
+                    "latest_label",
+                    "month_label",
+                    "observations",
+                ]
+            ],
+            get_position=["lon", "lat"],
+            get_fill_color="color",
+            get_radius=5000,
+            radius_min_pixels=4,
+            radius_max_pixels=30,
+            pickable=True,
+        )
+        tooltip = {
+            "html": "<b>{market}</b> ({region})<br/>"
+            "Average: PHP {average_label}<br/>"
+            "Latest ({month_label}): PHP {latest_label}<br/>"
+            "{observations} observations"
+        }
+    else:
+        cells = grid_cells(markets, cell_degrees, price_column)
+        layer_data = cells.assign(
+            color=price_colors(cells[price_column]),
+            price_label=cells[price_column].map("{:,.2f}".format),
+        )
+        layer = pdk.Layer(
+            "PolygonLayer",
+            data=layer_data,
+            get_polygon="polygon",
+            get_fill_color="color",
+            get_line_color=[255, 255, 255],
+            line_width_min_pixels=1,
+            opacity=0.6,
+            pickable=True,
+        )
+        tooltip = {
+            "html": f"{price_label}: PHP {{price_label}}<br/>"
+            "{markets} markets, {observations} observations"
+        }
+
+    deck = pdk.Deck(
+        layers=[layer],
+        initial_view_state=pdk.ViewState(
+            latitude=markets["lat"].mean(),
+            longitude=markets["lon"].mean(),
+            zoom=5,
+        ),
+        tooltip=tooltip,
+        map_style="light",
+    )
+timer.pydeck_chart(deck, use_container_width=True)
+st.caption("Green markets or cells are the cheapest in view, red the most expensive.")
+
+# Market table, most expensive first
+with st.expander("Prices by market"):
+    timer.dataframe(
+        markets.sort_values(price_column, ascending=False).rename(
+            columns={
+                "market": "Market Name",
+                "region": "Region",
+                "lat": "Latitude",
+                "lon": "Longitude",
+                "observations": "Observations",
+                "latest_month": "Latest Month",
+                "average_price": "Average Price (PHP)",
+                "latest_price": "Latest Price (PHP)",
+            }
+        ),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "Latest Month": st.column_config.DateColumn(format="MMM YYYY"),
+        },
+    )
+
+# Record this rerun's timings (and show them when the developer panel is on)
+timer.finish()
@@ -0,0 +1,122 @@
+import streamlit as st
+
+from utils.cache import derived, get_cohorts, get_cube
+from utils.charts import cohort_price_figure, cohort_trend_figure, cohort_yoy_figure
+from utils.cohorts import cohort_key, island_group_cohorts
+from utils.metrics import RerunTimer
+from utils.timeseries import GRANULARITIES
+from utils.widgets import (
+    cohort_editor,
+    error_bound_caption,
+    price_basis_caption,
+    price_basis_selector,
+)
+
+# Stage timings and payload sizes of this rerun
+timer = RerunTimer("Cohort Comparison")
+
+# Price column the cohorts are compared on
+value_column = price_basis_selector()
+
+with timer.stage("data"):
+    cube = get_cube(value_column)
+    # Per-series totals every cohort's metrics and trends are reduced from
+    comparison = get_cohorts(value_column)
+
+# Cohorts start as the island groups and are edited in the sidebar
+cohorts = cohort_editor(cube, island_group_cohorts(set(cube["#adm1+name"].unique())))
+
+st.write(
+    "Compare named groups of regions, commodities and price types side by side. "
+    "Add cohorts in the sidebar; a cohort left empty in a field includes every value, "
+    "and cohorts may overlap. Every cohort is computed together in one pass, so adding "
+    "cohorts barely changes how long the page takes."
+)
+
+if not cohorts:
+    st.info("Add a cohort in the sidebar to start comparing.")
+else:
+    # Results are shared across sessions through the derived-result cache,
+    # keyed on the canonical selections of every cohort
+    key = cohort_key(cohorts)
+
+    st.markdown("## Key Metrics")
+    with timer.stage("aggregation"):
+        cohort_metrics = derived(
+            "cohort_metrics",
+            None,
+            lambda: comparison.metrics(cohorts),
+            key,
+            value_column,
+        )
+    price = st.column_config.NumberColumn(format="%.2f")
+    timer.dataframe(
+        cohort_metrics,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "Average Price (PHP)": price,
+            "Median Price (PHP)": price,
+            "Std": price,
+            "Min": price,
+            "Max": price,
+        },
+    )
+    st.caption(
+        f"{price_basis_caption(value_column)} Median: {error_bound_caption(False).lower()}."
+    )
+
+    with timer.stage("figure"):
+        price_chart = derived(
+            "cohort_price_figure",
+            None,
+            lambda: cohort_price_figure(cohort_metrics),
+            key,
+            value_column,
+        )
+    timer.plotly_chart(price_chart, use_container_width=True)
+
+    st.markdown("## Price Trend by Cohort")
+    st.write(
+        "Each line is a cohort's average price per period. Show a cohort's rolling mean "
+        "from the legend; the chart below compares each cohort with a year earlier."
+    )
+    granularity = st.radio(
+        "Granularity",
+        list(GRANULARITIES),
+        index=2,
+        horizontal=True,
+        key="cohort_granularity",
+    )
+
+    with timer.stage("aggregation"):
+        cohort_trend = derived(
+            "cohort_trend",
+            None,
+            lambda: comparison.trends(cohorts, granularity),
+            key,
+            granularity,
+            value_column,
+        )
+    with timer.stage("figure"):
+        trend_chart = derived(
+            "cohort_trend_figure",
+            None,
+            lambda: cohort_trend_figure(cohort_trend, granularity),
+            key,
+            granularity,
+            value_column,
+        )
+        yoy_chart = derived(
+            "cohort_yoy_figure",
+            None,
+            lambda: cohort_yoy_figure(cohort_trend, granularity),
+            key,
+            granularity,
+            value_column,
+        )
+    timer.plotly_chart(trend_chart, use_container_width=True)
+    timer.plotly_chart(yoy_chart, use_container_width=True)
+
+# Record this rerun's timings (and show them when the developer panel is on)
+timer.finish()
@@ -1,33 +1,53 @@
-import numpy as np
-import pandas as pd
 import plotly.express as px
 import streamlit as st
 from streamlit_extras.metric_cards import style_metric_cards
 
+from utils.cache import (
+    get_cube,
+    get_display_dataset,
+    get_filter_index,
+    get_sketch,
+    get_sort_order,
+)
+from utils.charts import frequency_distribution
+from utils.distribution import (
+    DEFAULT_POINT_BUDGET,
+    box_figure,
+    box_statistics,
+    histogram_figure,
+)
+from utils.grid import PAGE_SIZES, page, page_count, search, window
+from utils.metrics import RerunTimer
+from utils.quantiles import describe, describe_exact
+from utils.widgets import error_bound_caption, exact_statistics_toggle, sidebar_filters
+
 st.header("Descriptive Statistics for Philippine Food Prices")
 
-# Access the cached data from session_state
-df = st.session_state.get("df", pd.DataFrame())
-
-# Define display-friendly column names for use in the app
-column_display_names = {
-    "#adm1+name": "Region",
-    "#adm2+name": "Subregion",
-    "#loc+market+name": "Market Name",
-    "#geo+lat": "Latitude",
-    "#geo+lon": "Longitude",
-    "#item+type": "Commodity Type",
-    "#item+name": "Commodity",
-    "#item+unit": "Unit",
-    "#item+price+flag": "Price Flag",
-    "#item+price+type": "Price Type",
-    "#currency": "Currency",
-    "#value": "Price (PHP)",
-    "#value+usd": "Price (USD)",
-}
-
-# Create a version of the dataframe with renamed columns for display only
-df_display = df.rename(columns=column_display_names)
+# Stage timings and payload sizes of this rerun
+timer = RerunTimer("Descriptive Statistics")
+
+# Access the shared dataset with display-friendly column names, restricted to
+# the sidebar selection through the precomputed row index
+with timer.stage("data"):
+    cube = get_cube()
+    df_all = get_display_dataset()
+regions_selected, commodities_selected, filters = sidebar_filters(cube)
+with timer.stage("filter"):
+    positions = get_filter_index().lookup(filters)
+    df_display = df_all if positions is None else df_all.take(positions)
+
+if df_display.empty:
+    st.warning("No data matches the selected regions and commodities.")
+    timer.finish()
+    st.stop()
+
+# Price summary from the cube and quantile sketch, or from every row for audits
+exact = exact_statistics_toggle()
+with timer.stage("aggregation"):
+    if exact:
+        price_summary = describe_exact(df_display["Price (PHP)"])
+    else:
+        price_summary = describe(cube, get_sketch(), filters)
 
 # List of default columns to display in multiselect
 default_columns = [
@@ -55,7 +75,44 @@ with tab1:
             "Filter Columns:", available_columns, default=valid_default_columns
         )
         if selected_columns:
-            st.dataframe(df_display[selected_columns], use_container_width=True)
+            # Sorting, searching and paging run on row positions of the shared
+            # dataset; only the rows of the visible page are sent to the browser
+            g1, g2, g3 = st.columns(3)
+            sort_column = g1.selectbox("Sort by", ["Dataset order"] + selected_columns)
+            descending = g1.toggle(
+                "Descending", disabled=sort_column == "Dataset order"
+            )
+            search_column = g2.selectbox("Search in", selected_columns)
+            search_text = g2.text_input("Contains", placeholder="Any value")
+            page_size = g3.selectbox("Rows per page", PAGE_SIZES, index=2)
+
+            with timer.stage("filter"):
+                order = None
+                if sort_column != "Dataset order":
+                    order = get_sort_order(sort_column, descending)
+                rows = window(len(df_all), positions, order)
+                if search_text:
+                    rows = search(df_all, search_column, search_text, rows)
+
+            pages = page_count(len(rows), page_size)
+            # Filters or a larger page size can leave the stored page out of range
+            if st.session_state.get("grid_page", 1) > pages:
+                st.session_state["grid_page"] = pages
+            page_number = g3.number_input(
+                "Page", min_value=1, max_value=pages, key="grid_page"
+            )
+
+            with timer.stage("filter"):
+                rows_page = page(df_all, rows, selected_columns, page_number, page_size)
+            timer.dataframe(rows_page, use_container_width=True)
+            first = (page_number - 1) * page_size
+            if len(rows):
+                st.caption(
+                    f"Rows {first + 1:,}–{first + len(rows_page):,} of "
+                    f"{len(rows):,} (page {page_number:,} of {pages:,})"
+                )
+            else:
+                st.caption("No rows match the search.")
         else:
             st.write("No columns selected.")
 
@@ -70,37 +127,66 @@ with tab2:
 
         with p1:
             st.info("25th Percentile", icon="⏱")
-            st.metric(
-                label="PHP",
-                value=f"{np.percentile(df_display['Price (PHP)'], 25):,.2f}",
-            )
+            st.metric(label="PHP", value=f"{price_summary['25%']:,.2f}")
+            st.caption(error_bound_caption(exact))
 
         with p2:
             st.info("Median (50th Percentile)", icon="⏱")
-            st.metric(
-                label="PHP",
-                value=f"{np.percentile(df_display['Price (PHP)'], 50):,.2f}",
-            )
+            st.metric(label="PHP", value=f"{price_summary['50%']:,.2f}")
+            st.caption(error_bound_caption(exact))
 
         with p3:
             st.info("75th Percentile", icon="⏱")
-            st.metric(
-                label="PHP",
-                value=f"{np.percentile(df_display['Price (PHP)'], 75):,.2f}",
-            )
+            st.metric(label="PHP", value=f"{price_summary['75%']:,.2f}")
+            st.caption(error_bound_caption(exact))
 
         # Display descriptive summary for numerical data
         st.subheader("Descriptive Summary of Prices")
-        st.write(df_display["Price (PHP)"].describe())
+        st.write(price_summary)
 
-        # Adding a box plot for price distribution
-        st.subheader("Price Distribution (Box Plot)")
-        fig = px.box(df_display, y="Price (PHP)", title="Distribution of Prices in PHP")
-        st.plotly_chart(fig, use_container_width=True)
+        # Distribution summarised on the server; only box statistics, a capped
+        # outlier sample or histogram bins are sent to the browser
+        st.subheader("Price Distribution")
+        d1, d2 = st.columns([2, 1])
+        chart_view = d1.radio(
+            "Chart", ["Box Plot", "Histogram"], horizontal=True, key="dist_view"
+        )
+        point_budget = d2.number_input(
+            "Outlier point budget",
+            min_value=0,
+            max_value=20000,
+            value=DEFAULT_POINT_BUDGET,
+            step=500,
+            help="Maximum number of individual outlier points drawn on the box plot",
+        )
+        prices = df_display["Price (PHP)"].to_numpy(dtype="float64")
+        if chart_view == "Box Plot":
+            with timer.stage("aggregation"):
+                box_stats = box_statistics(
+                    prices,
+                    [price_summary["25%"], price_summary["50%"], price_summary["75%"]],
+                    point_budget=point_budget,
+                )
+            with timer.stage("figure"):
+                fig = box_figure(
+                    box_stats, "Price (PHP)", "Distribution of Prices in PHP"
+                )
+            timer.plotly_chart(fig, use_container_width=True)
+            st.caption(
+                f"Showing {len(box_stats['outliers']):,} of "
+                f"{box_stats['outlier_count']:,} outliers"
+            )
+        else:
+            with timer.stage("figure"):
+                fig = histogram_figure(
+                    prices, "Price (PHP)", "Distribution of Prices in PHP"
+                )
+            timer.plotly_chart(fig, use_container_width=True)
 
     else:
         st.error("The 'Price (PHP)' column is missing from the dataset.")
 
+
 # Sidebar for additional analysis
 def categorical_analysis():
     st.sidebar.markdown("### Additional Analysis")
@@ -131,8 +217,8 @@ def categorical_analysis():
         if analysis_type == "Categorical":
             with c1:
                 st.subheader(f"Distribution of {column}")
-                freq_dist = df_display[column].value_counts().reset_index()
-                freq_dist.columns = [column, "Count"]
+                with timer.stage("aggregation"):
+                    freq_dist = frequency_distribution(df_display, column)
 
                 # Option to choose between Bar and Pie chart
                 chart_type = st.radio(
@@ -159,18 +245,18 @@ def categorical_analysis():
                     paper_bgcolor="rgba(0, 0, 0, 0)",
                     font=dict(color="#000000"),
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                timer.plotly_chart(fig, use_container_width=True)
 
         # Numerical analysis - descriptive summary
         else:
             with c1:
                 st.subheader("Numerical Summary of Prices")
-                st.write(df_display["Price (PHP)"].describe())
+                st.write(price_summary)
 
             with c2:
                 st.subheader("Sum of prices")
-                total_sales = np.sum(df_display["Price (PHP)"])
-                avg_sales = np.average(df_display["Price (PHP)"])
+                total_sales = price_summary["count"] * price_summary["mean"]
+                avg_sales = price_summary["mean"]
                 st.metric(
                     label="Total PHP",
                     value=f"{total_sales:,.2f}",
@@ -181,6 +267,7 @@ def categorical_analysis():
     else:
         st.sidebar.error("No valid categorical columns available for analysis.")
 
+
 # Apply styles to metric cards
 style_metric_cards(
     background_color="#00000000",
@@ -191,3 +278,6 @@ style_metric_cards(
 
 # Call the function for sidebar analysis
 categorical_analysis()
+
+# Record this rerun's timings (and show them when the developer panel is on)
+timer.finish()
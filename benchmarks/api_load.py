@@ -0,0 +1,190 @@
+"""Load-test the query API with concurrent clients.
+
+A local API server is started on a synthetic dataset of --rows rows written
+to a temporary directory (or --url points at a running one), a fixed pool of distinct queries is drawn from its dimensions,
+and each concurrency level sends the same number of requests picked from that
+pool, so later requests increasingly hit the response cache. A few edge-case
+queries are checked first, and any unexpected answer fails the run.
+
+    python -m benchmarks.api_load --rows 200000 --clients 1,8,32,64 --requests 1000
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+from tornado import gen  # noqa: E402
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError  # noqa: E402
+from tornado.ioloop import IOLoop  # noqa: E402
+
+from benchmarks.startup import free_port  # noqa: E402
+from benchmarks.synthetic import generate, write_csv  # noqa: E402
+
+STARTUP_TIMEOUT = 120
+
+GROUPINGS = [[], ["region"], ["commodity"], ["region", "commodity"], ["price_type"]]
+STATS = ["count,mean", "mean,median", "mean,median,p10,p90", "count,mean,std,min,max"]
+
+# Queries that once failed with a 500, and their expected status; the 200s
+# select nothing and must answer with no rows
+CHECKS = [
+    ("/v1/prices?commodity=Nope&by=region&stats=median", 200),
+    ("/v1/prices?commodity=Nope&by=region&stats=mean", 200),
+    ("/v1/prices?commodity=Nope&by=region&granularity=yearly&stats=p10", 200),
+    ("/v1/prices?commodity=Nope&granularity=monthly&stats=mean,p90", 200),
+    ("/v1/prices?stats=median,p50", 400),
+]
+
+
+def query_pool(dimensions, size, fmt, seed=0):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(size):
+        params = [
+            ("by", ",".join(rng.choice(GROUPINGS))),
+            ("stats", rng.choice(STATS)),
+            ("granularity", rng.choice(["none", "none", "yearly", "monthly"])),
+            ("basis", rng.choice(dimensions["bases"])),
+            ("format", fmt),
+        ]
+        for name in ["region", "commodity"]:
+            if rng.random() < 0.5:
+                chosen = rng.sample(dimensions[name], rng.randint(1, 3))
+                params.extend((name, value) for value in chosen)
+        queries.append(f"/v1/prices?{urlencode([p for p in params if p[1]])}")
+    return queries
+
+
+async def wait_until_healthy(client, url, deadline):
+    while time.perf_counter() < deadline:
+        try:
+            await client.fetch(f"{url}/v1/health")
+            return
+        except (ConnectionError, HTTPClientError, OSError):
+            await gen.sleep(0.1)
+    raise TimeoutError("the API did not start")
+
+
+async def check_queries(client, url):
+    failures = []
+    for path, status in CHECKS:
+        response = await client.fetch(url + path, raise_error=False)
+        if response.code != status:
+            failures.append(f"{path} answered {response.code}, not {status}")
+        elif status == 200 and json.loads(response.body)["rows"]:
+            failures.append(f"{path} returned rows for an empty selection")
+    if failures:
+        raise RuntimeError("; ".join(failures))
+    return len(CHECKS)
+
+
+async def load(url, queries, clients, requests, seed=0):
+    # clients coroutines share one connection-limited HTTP client
+    client = AsyncHTTPClient(force_instance=True, max_clients=clients)
+    rng = random.Random(seed)
+    paths = [rng.choice(queries) for _ in range(requests)]
+    latencies, sizes, errors = [], [], 0
+
+    async def worker():
+        nonlocal errors
+        while paths:
+            path = paths.pop()
+            start = time.perf_counter()
+            try:
+                response = await client.fetch(url + path, request_timeout=60)
+            except (HTTPClientError, OSError):
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            sizes.append(
+                int(response.headers.get("Content-Length", len(response.body)))
+            )
+
+    start = time.perf_counter()
+    await gen.multi([worker() for _ in range(clients)])
+    seconds = time.perf_counter() - start
+    client.close()
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "clients": clients,
+        "requests": requests,
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / seconds, 1),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 2),
+        "mean_response_bytes": round(float(np.mean(sizes))),
+    }
+
+
+def start_server(rows):
+    # The server builds its store from a synthetic CSV in a scratch directory,
+    # so the run does not depend on (or write next to) the repository's data
+    workdir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(workdir, "data"))
+    write_csv(generate(rows), os.path.join(workdir, "data", "wfp_food_prices_phl.csv"))
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "utils.api", "--port", str(port)],
+        cwd=workdir,
+        env={**os.environ, "PYTHONPATH": ROOT},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def measure(args):
+    server = None
+    url = args.url
+    if url is None:
+        server, url = start_server(args.rows)
+    client = AsyncHTTPClient(force_instance=True)
+    try:
+        await wait_until_healthy(client, url, time.perf_counter() + STARTUP_TIMEOUT)
+        checks = await check_queries(client, url)
+        dimensions = json.loads((await client.fetch(f"{url}/v1/dimensions")).body)
+        queries = query_pool(dimensions, args.distinct, args.format)
+        levels = sorted({int(count) for count in args.clients.split(",")})
+        return {
+            "url": url,
+            "format": args.format,
+            "checks_passed": checks,
+            "distinct_queries": len(queries),
+            "levels": [
+                await load(url, queries, clients, args.requests, seed)
+                for seed, clients in enumerate(levels)
+            ],
+        }
+    finally:
+        client.close()
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="running API to test instead of a local one")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--clients", default="1,8,32,64")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--distinct", type=int, default=200)
+    parser.add_argument("--format", choices=["json", "arrow"], default="json")
+    args = parser.parse_args()
+    report = IOLoop.current().run_sync(lambda: measure(args))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Measure how many price series the batch forecast job fits per second.
+
+A synthetic WFP-shaped export is ingested, then every series is fitted from
+scratch with each worker count, and the incremental job is timed on a rerun
+over unchanged data, which should reuse every stored forecast.
+
+    python -m benchmarks.forecast --rows 1m --workers 1,2,4,8
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.run import parse_size  # noqa: E402
+from benchmarks.synthetic import write_dataset  # noqa: E402
+from utils.forecast import forecast_all, run  # noqa: E402
+from utils.ingest import ingest, load_cube  # noqa: E402
+from utils.timeseries import PriceSeries  # noqa: E402
+
+
+def measure(rows, worker_counts, workdir):
+    csv_path = os.path.join(workdir, f"wfp_{rows}.csv")
+    if not os.path.exists(csv_path):
+        write_dataset(csv_path, rows)
+    store_path = os.path.join(workdir, f"forecast_store_{rows}")
+    shutil.rmtree(store_path, ignore_errors=True)
+    ingest(csv_path, store_path)
+    series = PriceSeries(load_cube(store_path))
+
+    results = {"rows": rows, "series": len(series.series), "full": []}
+    for workers in worker_counts:
+        start = time.perf_counter()
+        fitted = forecast_all(series, workers=workers)
+        seconds = time.perf_counter() - start
+        results["full"].append(
+            {
+                "workers": workers,
+                "seconds": round(seconds, 3),
+                "series_per_second": round(len(series.series) / seconds, 1),
+                "forecast_series": int(fitted["series_id"].nunique()),
+            }
+        )
+
+    # A repeated run with unchanged data reuses every stored forecast
+    run(max(worker_counts), store_path)
+    incremental = run(max(worker_counts), store_path)
+    results["unchanged_rerun"] = {
+        "refitted": incremental["refitted"],
+        "seconds": round(incremental["seconds"], 3),
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="1m")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count()}")
+    parser.add_argument(
+        "--workdir", default=os.path.join(tempfile.gettempdir(), "wfp_bench")
+    )
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    worker_counts = sorted({int(count) for count in args.workers.split(",")})
+    print(
+        json.dumps(
+            measure(parse_size(args.rows), worker_counts, args.workdir), indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""Headless benchmark of the dashboard's data paths on synthetic WFP exports.
+
+For each dataset size a WFP-shaped CSV is generated (and reused across runs),
+then every stage the pages depend on is timed: ingest, store loading, index
+and series construction, and the per-rerun filter, aggregation, percentile and
+trend computations. Each stage reports wall time and peak traced memory, and
+the whole run is emitted as JSON so results can be compared between commits.
+
+    python -m benchmarks.run --sizes 10k,1m,10m --output bench.json
+    python -m benchmarks.run --sizes 10k --baseline bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import write_dataset  # noqa: E402
+from utils.charts import (  # noqa: E402
+    average_price,
+    category_distribution,
+    commodity_ranking,
+    median_price,
+)
+from utils.cohorts import CohortComparison  # noqa: E402
+from utils.data import DISPLAY_NAMES, read_csv  # noqa: E402
+from utils.distribution import box_statistics  # noqa: E402
+from utils.filters import FilterIndex  # noqa: E402
+from utils.grid import page, sort_order, window  # noqa: E402
+from utils.ingest import (  # noqa: E402
+    ingest,
+    load_cube,
+    load_markets,
+    load_sketch,
+    load_store,
+)
+from utils.margins import (  # noqa: E402
+    align_price_types,
+    aligned_prices,
+    markup_distribution,
+    markup_trend,
+)
+from utils.markets import grid_cells, market_prices  # noqa: E402
+from utils.quantiles import describe, describe_exact  # noqa: E402
+from utils.timeseries import GRANULARITIES, PriceSeries  # noqa: E402
+from utils.volatility import Volatility  # noqa: E402
+
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+# Numbers of cohorts compared at once
+COHORT_COUNTS = [1, 4, 16, 64]
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    if text[-1] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+class Stages:
+    """Times named stages and records their peak traced memory.
+
+    Tracing slows allocation-heavy code such as CSV parsing considerably, so
+    wall time is measured untraced and peak memory in one extra traced call.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.results = {}
+
+    def run(self, name, func, *args, repeat=1):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = func(*args)
+        seconds = (time.perf_counter() - start) / repeat
+        stage = {"seconds": round(seconds, 6)}
+        if self.trace_memory:
+            tracemalloc.start()
+            func(*args)
+            stage["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+            tracemalloc.stop()
+        self.results[name] = stage
+        return result
+
+
+def selections(cube):
+    # Representative sidebar states, from "ALL" to narrow multi-selections
+    regions = sorted(cube["#adm1+name"].unique())
+    commodities = sorted(cube["#item+name"].unique())
+    return {
+        "all": {"#adm1+name": None, "#item+name": None},
+        "one_region": {"#adm1+name": regions[:1], "#item+name": None},
+        "three_regions_two_commodities": {
+            "#adm1+name": regions[:3],
+            "#item+name": commodities[:2],
+        },
+        "one_commodity": {"#adm1+name": None, "#item+name": commodities[:1]},
+    }
+
+
+def page_rollups(cube, filters):
+    # Every cube query the Visualization page makes on a rerun
+    average_price(cube, [], filters)
+    category_distribution(cube, filters)
+    average_price(cube, ["#adm1+name", "#item+name"], filters)
+    commodity_ranking(cube, filters)
+
+
+def trends(series, filters):
+    for granularity in GRANULARITIES:
+        series.trend(filters, granularity)
+
+
+def cohort_sets(cube, n, seed=0):
+    # n overlapping cohorts of a few regions, commodities or price types each
+    rng = np.random.default_rng(seed)
+    columns = ["#adm1+name", "#item+name", "#item+price+type"]
+    cohorts = {}
+    for i in range(n):
+        filters = {}
+        for column in columns:
+            values = cube[column].unique()
+            if rng.random() < 0.6:
+                size = rng.integers(1, min(3, len(values)) + 1)
+                filters[column] = sorted(rng.choice(values, size, replace=False))
+        cohorts[f"cohort {i}"] = filters
+    return cohorts
+
+
+def cohorts_grouped(comparison, cohorts):
+    # The Cohort Comparison page: every cohort's metrics and trends in one pass
+    comparison.metrics(cohorts)
+    for granularity in GRANULARITIES:
+        comparison.trends(cohorts, granularity)
+
+
+def cohorts_separate(cube, sketch, series, cohorts):
+    # The same results from one filtered computation per cohort
+    for filters in cohorts.values():
+        describe(cube, sketch, filters)
+        trends(series, filters)
+
+
+def grid_page(display, positions, order):
+    # One sorted page of the dataset grid, given the cached sort order
+    rows = window(len(display), positions, order)
+    return page(display, rows, ["Commodity", "Price (PHP)", "Date"], 1, 100)
+
+
+def market_map(markets, filters):
+    # The map page's per-market table for one commodity, and its grid rollup
+    commodities = filters["#item+name"] or markets["#item+name"].cat.categories[:1]
+    prices = market_prices(markets, {"#item+name": list(commodities[:1])})
+    return grid_cells(prices, 0.5)
+
+
+def margins(aligned, filters):
+    # The Visualization page's retail vs wholesale section
+    aligned_prices(aligned, filters)
+    markup_distribution(aligned, filters)
+    markup_trend(aligned, filters)
+
+
+def baseline_rerun(df, filters):
+    # The pre-cube page logic: isin filters and raw group-bys on every rerun
+    filtered = df
+    for column, values in filters.items():
+        if values is not None:
+            filtered = filtered[filtered[column].isin(values)]
+    filtered.groupby(["#adm1+name", "#item+name"], observed=True)["#value"].mean()
+    filtered.groupby(["#item+price+type", "#item+name"], observed=True)["#value"].mean()
+    filtered.groupby("#item+name", observed=True)["#value"].mean().nlargest(5)
+    filtered.resample("YE", on="#date")["#value"].mean()
+    np.percentile(filtered["#value"], [25, 50, 75])
+
+
+def full_ingest(csv_path, store_path):
+    # Always measure a from-scratch build, not a no-op refresh
+    shutil.rmtree(store_path, ignore_errors=True)
+    return ingest(csv_path, store_path)
+
+
+def benchmark_size(rows, workdir, trace_memory, repeat):
+    csv_path = os.path.join(workdir, f"wfp_{rows}.csv")
+    if not os.path.exists(csv_path):
+        write_dataset(csv_path, rows)
+    store_path = os.path.join(workdir, f"store_{rows}")
+
+    stages = Stages(trace_memory)
+    stages.run("baseline_read_csv", read_csv, csv_path)
+    stages.run("ingest", full_ingest, csv_path, store_path)
+    df = stages.run("load_store", load_store, store_path)
+    cube = stages.run("load_cube", load_cube, store_path)
+    sketch = stages.run("load_sketch", load_sketch, store_path)
+    markets = stages.run("load_markets", load_markets, store_path)
+    index = stages.run("build_filter_index", FilterIndex, df)
+    series = stages.run("build_price_series", PriceSeries, cube)
+    volatility = stages.run("build_volatility", Volatility, markets)
+    aligned = stages.run("align_price_types", align_price_types, df)
+    comparison = stages.run("build_cohorts", CohortComparison, cube, sketch, series)
+    for n in COHORT_COUNTS:
+        cohorts = cohort_sets(cube, n)
+        stages.run(f"cohorts_{n}", cohorts_grouped, comparison, cohorts, repeat=repeat)
+        stages.run(
+            f"cohorts_{n}_separate",
+            cohorts_separate,
+            cube,
+            sketch,
+            series,
+            cohorts,
+            repeat=repeat,
+        )
+    display = df.rename(columns=DISPLAY_NAMES)
+    order = stages.run("sort_order", sort_order, display, "Price (PHP)", True)
+
+    per_selection = {}
+    for name, filters in selections(cube).items():
+        query = Stages(trace_memory)
+        filtered = query.run("filter", index.apply, display, filters, repeat=repeat)
+        query.run("rollups", page_rollups, cube, filters, repeat=repeat)
+        query.run("median_sketch", median_price, sketch, filters, repeat=repeat)
+        query.run(
+            "median_exact", median_price, sketch, filters, filtered, repeat=repeat
+        )
+        summary = query.run(
+            "describe_sketch", describe, cube, sketch, filters, repeat=repeat
+        )
+        query.run(
+            "describe_exact", describe_exact, filtered["Price (PHP)"], repeat=repeat
+        )
+        query.run("trends", trends, series, filters, repeat=repeat)
+        query.run(
+            "grid_page", grid_page, display, index.lookup(filters), order, repeat=repeat
+        )
+        if len(filtered):
+            query.run(
+                "box_statistics",
+                box_statistics,
+                filtered["Price (PHP)"].to_numpy(dtype="float64"),
+                [summary["25%"], summary["50%"], summary["75%"]],
+                repeat=repeat,
+            )
+        query.run("market_map", market_map, markets, filters, repeat=repeat)
+        query.run(
+            "volatility_ranking",
+            volatility.commodity_volatility,
+            filters,
+            repeat=repeat,
+        )
+        query.run("margins", margins, aligned, filters, repeat=repeat)
+        query.run("baseline_rerun", baseline_rerun, df, filters, repeat=repeat)
+        per_selection[name] = {"rows": len(filtered), "stages": query.results}
+
+    return {
+        "rows": rows,
+        "stages": stages.results,
+        "selections": per_selection,
+        "total_seconds": round(
+            sum(stage["seconds"] for stage in stages.results.values()), 6
+        ),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(report):
+    # (size, selection, stage) -> seconds, for comparing two reports
+    flat = {}
+    for result in report["results"]:
+        for stage, values in result["stages"].items():
+            flat[(result["rows"], "-", stage)] = values["seconds"]
+        for selection, data in result["selections"].items():
+            for stage, values in data["stages"].items():
+                flat[(result["rows"], selection, stage)] = values["seconds"]
+    return flat
+
+
+def compare(baseline, report):
+    old, new = flatten(baseline), flatten(report)
+    header = ["rows", "selection", "stage", "old s", "new s"]
+    print("{:>10}  {:<30} {:<20} {:>10} {:>10}  ratio".format(*header))
+    for key in sorted(set(old) & set(new)):
+        ratio = new[key] / old[key] if old[key] else float("nan")
+        rows, selection, stage = key
+        print(
+            f"{rows:>10}  {selection:<30} {stage:<20} "
+            f"{old[key]:>10.4f} {new[key]:>10.4f}  {ratio:.2f}x"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10k,1m,10m")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--workdir", default=os.path.join(tempfile.gettempdir(), "wfp_bench")
+    )
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    report = {
+        "commit": git_commit(),
+        "timestamp": pd.Timestamp.now(tz="UTC").isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "results": [],
+    }
+    for size in args.sizes.split(","):
+        report["results"].append(
+            benchmark_size(
+                parse_size(size), args.workdir, not args.no_memory, args.repeat
+            )
+        )
+    report["max_rss_mb"] = round(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+    )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Measure how much memory each additional Streamlit session retains.
+
+Every simulated session runs the Food Prices Visualization page against the
+same process, so the shared dataset is loaded once and later sessions should
+only add their widget state and chart payloads.
+
+    python -m benchmarks.session_memory --rows 200000 --sessions 10
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from benchmarks.synthetic import generate, write_csv  # noqa: E402
+
+
+def measure(rows, sessions, page):
+    workdir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(workdir, "data"))
+    write_csv(generate(rows), os.path.join(workdir, "data", "wfp_food_prices_phl.csv"))
+    os.chdir(workdir)
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    apps, samples = [], []
+    for i in range(sessions):
+        app = AppTest.from_file(os.path.join(ROOT, page), default_timeout=120)
+        app.run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+        # Keep every session alive, as concurrent browser tabs would
+        apps.append(app)
+        gc.collect()
+        current = tracemalloc.get_traced_memory()[0]
+        samples.append(
+            {"sessions": i + 1, "retained_mb": round((current - baseline) / 1e6, 2)}
+        )
+    tracemalloc.stop()
+
+    for previous, sample in zip(samples, samples[1:]):
+        sample["delta_mb"] = round(sample["retained_mb"] - previous["retained_mb"], 2)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--page", default="app_pages/2_Visualization.py")
+    args = parser.parse_args()
+
+    samples = measure(args.rows, args.sessions, args.page)
+    print(
+        json.dumps({"rows": args.rows, "page": args.page, "samples": samples}, indent=2)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Measure import times and time to first paint of a cold dashboard process.
+
+Each module is imported in a fresh interpreter and timed. Then the app is
+started with ``streamlit run`` in each start-up mode, and a headless client
+opens the landing page over the app's websocket, recording when the server
+answers its health check, when the first element arrives (first paint) and
+when the page finishes; a second session then opens the Visualization page,
+which shows whether the background warm-up had the data ready for it.
+
+    python -m benchmarks.startup --repeat 3
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.proto.BackMsg_pb2 import BackMsg  # noqa: E402
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg  # noqa: E402
+from tornado import gen  # noqa: E402
+from tornado.httpclient import (  # noqa: E402
+    AsyncHTTPClient,
+    HTTPClientError,
+    HTTPRequest,
+)
+from tornado.ioloop import IOLoop  # noqa: E402
+from tornado.simple_httpclient import HTTPTimeoutError  # noqa: E402
+from tornado.websocket import websocket_connect  # noqa: E402
+
+# What each page pulls in before it can render, cheapest first
+MODULES = [
+    "streamlit",
+    "st_pages",
+    "utils.startup",
+    "pandas",
+    "utils.cache",
+    "plotly.express",
+    "utils.charts",
+]
+
+# Page opened by the second session, after the landing page
+SECOND_PAGE = "Visualization"
+
+STARTUP_TIMEOUT = 120
+
+
+def import_seconds(module, repeat):
+    # Median time to import module in a fresh interpreter
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - start)"
+    )
+    samples = [
+        float(
+            subprocess.run(
+                [sys.executable, "-c", code],
+                cwd=ROOT,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        )
+        for _ in range(repeat)
+    ]
+    return round(statistics.median(samples), 3)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_healthy(port, deadline):
+    client = AsyncHTTPClient()
+    while time.perf_counter() < deadline:
+        try:
+            await client.fetch(f"http://127.0.0.1:{port}/_stcore/health")
+            return
+        except (ConnectionError, HTTPClientError, HTTPTimeoutError, OSError):
+            await gen.sleep(0.05)
+    raise TimeoutError("the app did not start")
+
+
+def visible_element(forward):
+    # Spinners and placeholders arrive as empty elements before any content
+    return (
+        forward.WhichOneof("type") == "delta"
+        and forward.delta.WhichOneof("type") == "new_element"
+        and forward.delta.new_element.WhichOneof("type") != "empty"
+    )
+
+
+async def open_page(port, page_script_hash=""):
+    # Runs one page in a new session; times are relative to the connection
+    start = time.perf_counter()
+    connection = await websocket_connect(
+        HTTPRequest(f"ws://127.0.0.1:{port}/_stcore/stream")
+    )
+    message = BackMsg()
+    message.rerun_script.page_script_hash = page_script_hash
+    await connection.write_message(message.SerializeToString(), binary=True)
+
+    result, pages = {}, {}
+    while True:
+        raw = await connection.read_message()
+        if raw is None:
+            raise ConnectionError("the app closed the session")
+        forward = ForwardMsg()
+        forward.ParseFromString(raw)
+        kind = forward.WhichOneof("type")
+        if kind == "navigation":
+            pages = {
+                page.url_pathname: page.page_script_hash
+                for page in forward.navigation.app_pages
+            }
+        elif visible_element(forward) and "first_paint_seconds" not in result:
+            result["first_paint_seconds"] = round(time.perf_counter() - start, 3)
+        elif kind == "script_finished":
+            result["finished_seconds"] = round(time.perf_counter() - start, 3)
+            break
+    connection.close()
+    return result, pages
+
+
+async def first_paint(mode):
+    port = free_port()
+    env = {
+        **os.environ,
+        "DASHBOARD_STARTUP": mode,
+        "DASHBOARD_METRICS_PORT": str(free_port()),
+    }
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "streamlit",
+            "run",
+            "app.py",
+            "--server.headless=true",
+            f"--server.port={port}",
+            "--browser.gatherUsageStats=false",
+        ],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        await wait_until_healthy(port, start + STARTUP_TIMEOUT)
+        result = {"server_ready_seconds": round(time.perf_counter() - start, 3)}
+        result["landing_page"], pages = await open_page(port)
+        if SECOND_PAGE in pages:
+            result["second_page"], _ = await open_page(port, pages[SECOND_PAGE])
+        return result
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--modes", default="lazy,eager")
+    args = parser.parse_args()
+
+    report = {
+        "import_seconds": {
+            module: import_seconds(module, args.repeat) for module in MODULES
+        },
+        "startup": {
+            mode: IOLoop.current().run_sync(lambda: first_paint(mode))
+            for mode in args.modes.split(",")
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
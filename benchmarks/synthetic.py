@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+
+# HDX header row followed by the HXL tag row that the app uses as column names
+HEADER = [
+    "date",
+    "admin1",
+    "admin2",
+    "market",
+    "latitude",
+    "longitude",
+    "category",
+    "commodity",
+    "unit",
+    "priceflag",
+    "pricetype",
+    "currency",
+    "price",
+    "usdprice",
+]
+TAGS = [
+    "#date",
+    "#adm1+name",
+    "#adm2+name",
+    "#loc+market+name",
+    "#geo+lat",
+    "#geo+lon",
+    "#item+type",
+    "#item+name",
+    "#item+unit",
+    "#item+price+flag",
+    "#item+price+type",
+    "#currency",
+    "#value",
+    "#value+usd",
+]
+
+REGIONS = [
+    "National Capital region",
+    "Cordillera Administrative region",
+    "Ilocos",
+    "Cagayan Valley",
+    "Central Luzon",
+    "Calabarzon",
+    "Mimaropa",
+    "Bicol",
+    "Western Visayas",
+    "Central Visayas",
+    "Eastern Visayas",
+    "Zamboanga Peninsula",
+    "Northern Mindanao",
+    "Davao",
+    "Soccsksargen",
+    "Caraga",
+    "Bangsamoro",
+]
+
+# Name, category, unit and a typical retail price in PHP
+COMMODITIES = [
+    ("Rice (regular, milled)", "cereals and tubers", "KG", 40),
+    ("Rice (well milled)", "cereals and tubers", "KG", 45),
+    ("Rice (premium)", "cereals and tubers", "KG", 52),
+    ("Maize flour (yellow)", "cereals and tubers", "KG", 35),
+    ("Maize (white)", "cereals and tubers", "KG", 28),
+    ("Potatoes (Irish)", "cereals and tubers", "100 Tubers", 900),
+    ("Sweet potatoes", "cereals and tubers", "KG", 45),
+    ("Cassava", "cereals and tubers", "KG", 30),
+    ("Fish (tilapia)", "meat, fish and eggs", "KG", 130),
+    ("Fish (milkfish)", "meat, fish and eggs", "KG", 170),
+    ("Fish (mackerel, fresh)", "meat, fish and eggs", "KG", 220),
+    ("Fish (roundscad)", "meat, fish and eggs", "KG", 180),
+    ("Meat (pork)", "meat, fish and eggs", "KG", 260),
+    ("Meat (pork, with fat)", "meat, fish and eggs", "KG", 240),
+    ("Meat (beef)", "meat, fish and eggs", "KG", 340),
+    ("Meat (chicken, whole)", "meat, fish and eggs", "KG", 170),
+    ("Eggs", "meat, fish and eggs", "Piece", 7),
+    ("Bananas (lakatan)", "vegetables and fruits", "KG", 70),
+    ("Bananas (saba)", "vegetables and fruits", "KG", 40),
+    ("Mangoes (carabao)", "vegetables and fruits", "KG", 110),
+    ("Onions (red)", "vegetables and fruits", "KG", 120),
+    ("Onions (white)", "vegetables and fruits", "KG", 110),
+    ("Garlic", "vegetables and fruits", "KG", 130),
+    ("Tomatoes", "vegetables and fruits", "KG", 60),
+    ("Cabbage", "vegetables and fruits", "KG", 50),
+    ("Carrots", "vegetables and fruits", "KG", 70),
+    ("Eggplants", "vegetables and fruits", "KG", 65),
+    ("Oil (cooking)", "oil and fats", "L", 90),
+    ("Oil (palm)", "oil and fats", "L", 80),
+    ("Sugar (brown)", "miscellaneous food", "KG", 55),
+    ("Sugar (white)", "miscellaneous food", "500 G", 35),
+    ("Beans (mung)", "pulses and nuts", "KG", 95),
+    ("Groundnuts (shelled)", "pulses and nuts", "KG", 120),
+]
+
+MONTHS = pd.date_range("2000-01-15", "2024-06-15", freq="MS") + pd.Timedelta(days=14)
+
+
+def generate(rows, markets_per_region=8, seed=0, months=(0, len(MONTHS))):
+    # Rows are sorted by date within the given range of month indices, like the
+    # WFP export, with realistic region, market and commodity cardinality
+    rng = np.random.default_rng(seed)
+    regions = len(REGIONS)
+    markets = regions * markets_per_region
+
+    region = rng.integers(0, regions, rows)
+    market = region * markets_per_region + rng.integers(0, markets_per_region, rows)
+    commodity = rng.integers(0, len(COMMODITIES), rows)
+    month = np.sort(rng.integers(months[0], months[1], rows))
+    retail = rng.random(rows) < 0.7
+
+    base = np.array([item[3] for item in COMMODITIES], dtype="float64")[commodity]
+    trend = 1 + month / len(MONTHS)
+    noise = 1 + 0.1 * rng.standard_normal(rows)
+    price = np.round(base * trend * noise * np.where(retail, 1.2, 1.0), 2)
+
+    # Market attributes are fixed per market, independent of the chunk seed
+    market_rng = np.random.default_rng(12345)
+    market_lat = market_rng.uniform(5.5, 18.5, markets).round(4)
+    market_lon = market_rng.uniform(118.0, 126.5, markets).round(4)
+    market_names = np.array([f"Market {i + 1}" for i in range(markets)], dtype=object)
+    province_names = np.array(
+        [f"Province {i // 3 + 1}" for i in range(markets)], dtype=object
+    )
+    month_names = np.array(MONTHS.strftime("%Y-%m-%d"), dtype=object)
+
+    def column(values, index):
+        return np.array(values, dtype=object)[index]
+
+    return pd.DataFrame(
+        {
+            "#date": month_names[month],
+            "#adm1+name": column(REGIONS, region),
+            "#adm2+name": province_names[market],
+            "#loc+market+name": market_names[market],
+            "#geo+lat": market_lat[market],
+            "#geo+lon": market_lon[market],
+            "#item+type": column([item[1] for item in COMMODITIES], commodity),
+            "#item+name": column([item[0] for item in COMMODITIES], commodity),
+            "#item+unit": column([item[2] for item in COMMODITIES], commodity),
+            "#item+price+flag": "actual",
+            "#item+price+type": np.where(retail, "Retail", "Wholesale"),
+            "#currency": "PHP",
+            "#value": price,
+            "#value+usd": np.round(price / 52.0, 4),
+        }
+    )
+
+
+def write_csv(df, path):
+    with open(path, "w", newline="") as f:
+        f.write(",".join(HEADER) + "\n")
+        df.to_csv(f, index=False, header=TAGS)
+
+
+def write_dataset(path, rows, chunk_rows=1_000_000, seed=0):
+    # Writes the export in date-ordered chunks so large sizes fit in memory
+    chunks = max(1, -(-rows // chunk_rows))
+    bounds = np.linspace(0, len(MONTHS), chunks + 1).astype(int)
+    with open(path, "w", newline="") as f:
+        f.write(",".join(HEADER) + "\n")
+        f.write(",".join(TAGS) + "\n")
+        for i in range(chunks):
+            size = min(chunk_rows, rows - i * chunk_rows)
+            df = generate(size, seed=seed + i, months=(bounds[i], bounds[i + 1]))
+            df.to_csv(f, index=False, header=False)
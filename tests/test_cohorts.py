@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import REGIONS, generate
+from utils.cohorts import (
+    ISLAND_GROUPS,
+    CohortComparison,
+    island_group,
+    island_group_cohorts,
+)
+from utils.cube import build_cube
+from utils.quantiles import RELATIVE_ACCURACY, QuantileSketch
+from utils.timeseries import PriceSeries
+
+
+@pytest.fixture(scope="module")
+def prices():
+    df = generate(3000)
+    df["#date"] = pd.to_datetime(df["#date"])
+    return df
+
+
+@pytest.fixture(scope="module")
+def comparison(prices):
+    cube = build_cube(prices)
+    sketch = QuantileSketch.from_frame(prices)
+    return CohortComparison(cube, sketch, PriceSeries(cube))
+
+
+def test_medians_within_bound(prices, comparison):
+    cohorts = {
+        "Ilocos rice": {
+            "#adm1+name": ["Ilocos"],
+            "#item+name": ["Rice (regular, milled)"],
+        },
+        "Davao": {"#adm1+name": ["Davao"]},
+        "Retail": {"#item+price+type": ["Retail"]},
+    }
+    medians = comparison.medians(cohorts)
+    for median, filters in zip(medians, cohorts.values()):
+        rows = np.ones(len(prices), dtype=bool)
+        for column, values in filters.items():
+            rows &= prices[column].isin(values).to_numpy()
+        exact = np.percentile(prices["#value"][rows], 50)
+        assert abs(median - exact) <= RELATIVE_ACCURACY * exact + 1e-9
+
+
+def test_every_region_in_exactly_one_island_group():
+    for region in REGIONS:
+        groups = [
+            group for group, members in ISLAND_GROUPS.items() if region in members
+        ]
+        assert len(groups) == 1, region
+
+    members = [
+        region
+        for cohort in island_group_cohorts(set(REGIONS)).values()
+        for region in cohort["#adm1+name"]
+    ]
+    assert sorted(members) == sorted(REGIONS)
+
+
+def test_island_group_aliases():
+    assert island_group("Region IV-A") == "Luzon"
+    assert island_group("  central   visayas ") == "Visayas"
+    assert island_group("Autonomous region in Muslim Mindanao") == "Mindanao"
+    assert island_group("Mindanao X") is None
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.quantiles import RELATIVE_ACCURACY, SKETCH_DIMENSIONS, QuantileSketch
+
+PERCENTS = [0, 1, 10, 25, 33, 50, 66, 75, 90, 99, 100]
+
+
+def frame(values, groups=None):
+    groups = np.zeros(len(values), dtype=int) if groups is None else groups
+    df = pd.DataFrame({column: "x" for column in SKETCH_DIMENSIONS}, index=groups)
+    df["#adm1+name"] = [f"region {group}" for group in groups]
+    df["#value"] = values
+    return df.reset_index(drop=True)
+
+
+def assert_within_bound(estimates, exact):
+    np.testing.assert_array_less(
+        np.abs(estimates - exact), RELATIVE_ACCURACY * np.abs(exact) + 1e-9
+    )
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 4, 5, 7, 10, 25])
+def test_quantiles_within_bound_on_small_groups(size):
+    rng = np.random.default_rng(size)
+    for _ in range(50):
+        values = rng.lognormal(4, 1, size).round(2)
+        sketch = QuantileSketch.from_frame(frame(values))
+        assert_within_bound(sketch.quantiles(PERCENTS), np.percentile(values, PERCENTS))
+
+
+def test_quantiles_between_distant_values():
+    # Two far-apart prices: nearest rank would answer one of them for the median
+    values = np.array([10.0, 1000.0])
+    sketch = QuantileSketch.from_frame(frame(values))
+    assert_within_bound(sketch.quantiles([50]), np.percentile(values, [50]))
+
+
+def test_grouped_quantiles_within_bound():
+    rng = np.random.default_rng(0)
+    groups = rng.integers(0, 6, 40)
+    values = rng.lognormal(4, 1, 40).round(2)
+    values[groups == 5] = 0.0
+    sketch = QuantileSketch.from_frame(frame(values, groups))
+    result = sketch.grouped_quantiles(PERCENTS, ["#adm1+name"])
+    for _, row in result.iterrows():
+        group = int(row["#adm1+name"].split()[-1])
+        exact = np.percentile(values[groups == group], PERCENTS)
+        assert_within_bound(row[PERCENTS].to_numpy(dtype="float64"), exact)
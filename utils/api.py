@@ -0,0 +1,372 @@
+"""Local HTTP/JSON query API over the price store.
+
+Answers filtered aggregate queries (count, mean, std, min, max, median and
+percentiles by region, commodity, price type and period) from the same cube,
+quantile sketch and in-memory dataset the dashboard pages read. The server
+runs its own event loop on a background thread of the Streamlit process
+(``DASHBOARD_API_PORT``, default 8601; 0 turns it off), or standalone:
+
+    python -m utils.api --port 8601
+
+Medians and percentiles not grouped by period come from the sketch, linearly
+interpolated between ranks as np.percentile does and within ±1% of its value
+(``"method": "sketch"``); grouped by period they are exact. Queries are
+computed on a thread pool, never on the Streamlit script threads, and encoded
+responses are cached per dataset version, so a repeated query is served from
+memory. Responses are JSON, or Arrow IPC streams with ``format=arrow``, and
+gzip-compressed for clients that accept it.
+
+    GET /v1/health
+    GET /v1/dimensions
+    GET /v1/prices?commodity=Rice (regular, milled)&by=region&granularity=yearly
+        &stats=mean,median,p90&basis=standard&format=arrow
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+import tornado.web
+
+from utils.cache import (
+    BACKGROUND_THREAD_PREFIX,
+    dataset_version,
+    get_cube,
+    get_dataset,
+    get_filter_index,
+    get_sketch,
+)
+from utils.cube import rollup, select
+from utils.memo import DerivedCache
+from utils.normalize import PRICE_BASES
+from utils.timeseries import GRANULARITIES
+
+API_PORT = int(os.environ.get("DASHBOARD_API_PORT", "8601"))
+API_WORKERS = int(os.environ.get("DASHBOARD_API_WORKERS", "4"))
+
+# Query parameter names of the filter and group-by dimensions
+DIMENSIONS = {
+    "region": "#adm1+name",
+    "commodity": "#item+name",
+    "price_type": "#item+price+type",
+    "commodity_type": "#item+type",
+}
+
+BASES = dict(zip(["reported", "standard", "real"], PRICE_BASES.values()))
+
+CUBE_STATS = ["count", "mean", "std", "min", "max"]
+DEFAULT_STATS = ["count", "mean", "median"]
+PERCENTILE_PATTERN = re.compile(r"^p(\d{1,2}(?:\.\d+)?)$")
+
+# Bodies smaller than this are sent uncompressed
+GZIP_MIN_BYTES = 1024
+
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+
+
+class QueryError(ValueError):
+    """A query parameter the API cannot answer; reported as a 400."""
+
+
+def percentile(stat):
+    # Percent for "median" and "p<NN>" stats, None for the cube stats
+    if stat == "median":
+        return 50.0
+    match = PERCENTILE_PATTERN.match(stat)
+    if match:
+        return float(match.group(1))
+    if stat not in CUBE_STATS:
+        raise QueryError(f"unknown stat {stat!r}")
+    return None
+
+
+def parse_query(arguments):
+    # Query string arguments (name -> list of str) to a canonical query
+    def values(name):
+        return [value.decode() for value in arguments.get(name, [])]
+
+    def single(name, default, choices):
+        value = (values(name) or [default])[-1]
+        if value not in choices:
+            raise QueryError(f"{name} must be one of {', '.join(choices)}")
+        return value
+
+    def listed(name, default):
+        items = [item for value in values(name) for item in value.split(",") if item]
+        return items or default
+
+    by = listed("by", [])
+    for dimension in by:
+        if dimension not in DIMENSIONS:
+            raise QueryError(f"cannot group by {dimension!r}")
+    stats = list(dict.fromkeys(listed("stats", DEFAULT_STATS)))
+    percents = {}
+    for stat in stats:
+        q = percentile(stat)
+        if q is not None and q in percents:
+            raise QueryError(f"{percents[q]} and {stat} are the same percentile")
+        percents[q] = stat
+    granularities = ["none"] + [name.lower() for name in GRANULARITIES]
+    return {
+        # Values are not split on commas, which appear in commodity names
+        "filters": {
+            column: values(name) or None for name, column in DIMENSIONS.items()
+        },
+        "by": by,
+        "granularity": single("granularity", "none", granularities),
+        "stats": stats,
+        "basis": single("basis", "reported", list(BASES)),
+        "format": single("format", "json", ["json", "arrow"]),
+    }
+
+
+def _period(months, granularity):
+    freq = GRANULARITIES[granularity.capitalize()]["freq"]
+    return months.dt.to_period(freq[0]).dt.start_time
+
+
+def price_statistics(query):
+    # One row per group (and period), one column per requested stat. Cube
+    # stats come from the cube; percentiles come from the sketch, or from the
+    # selected rows when grouped by period, which the sketch does not keep
+    value_column = BASES[query["basis"]]
+    filters, granularity = query["filters"], query["granularity"]
+    by = [DIMENSIONS[name] for name in query["by"]]
+    names = {column: name for name, column in DIMENSIONS.items()}
+    keys = by + ([] if granularity == "none" else ["date"])
+
+    cube = select(get_cube(value_column), filters)
+    if granularity != "none":
+        cube = cube.assign(date=_period(cube["month"], granularity))
+    totals = rollup(cube, keys)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variance = (totals["sumsq"] - totals["count"] * totals["mean"] ** 2) / (
+            totals["count"] - 1
+        )
+    totals["std"] = np.sqrt(np.maximum(variance, 0))
+    result = totals[keys + [stat for stat in CUBE_STATS if stat in query["stats"]]]
+
+    percentiles = {stat: percentile(stat) for stat in query["stats"]}
+    percentiles = {stat: q for stat, q in percentiles.items() if q is not None}
+    method = "cube"
+    if percentiles and granularity == "none":
+        method = "sketch"
+        quantiles = get_sketch(value_column).grouped_quantiles(
+            list(percentiles.values()), by, filters
+        )
+    elif percentiles:
+        method = "exact"
+        rows = get_filter_index().apply(get_dataset(), filters)
+        rows = rows[by + [value_column]].assign(
+            date=_period(rows["#date"], granularity)
+        )
+        if rows.empty:
+            # unstack() of an empty group-by loses the percentile columns
+            quantiles = pd.DataFrame(columns=keys + list(percentiles.values()))
+        else:
+            quantiles = (
+                rows.groupby(keys, observed=True)[value_column]
+                .quantile([q / 100 for q in percentiles.values()])
+                .unstack()
+                .set_axis(list(percentiles.values()), axis=1)
+                .reset_index()
+            )
+    if percentiles:
+        quantiles = quantiles.rename(
+            columns={q: stat for stat, q in percentiles.items()}
+        )
+        if keys and quantiles.empty:
+            # Nothing selected; an empty frame's keys may not match in dtype
+            result = result.assign(**{stat: np.nan for stat in percentiles})
+        elif keys:
+            result = result.merge(quantiles, on=keys, how="left")
+        else:
+            result = result.assign(**quantiles.iloc[0].to_dict())
+
+    result = result[keys + query["stats"]].rename(columns=names)
+    for name in query["by"]:
+        # Through object, as an empty categorical cannot be cast to str directly
+        result[name] = result[name].astype(object).astype(str)
+    return result, method
+
+
+def encode(frame, meta, fmt):
+    # (content type, body) of a result frame
+    if fmt == "arrow":
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        table = table.replace_schema_metadata(
+            {key: str(value) for key, value in meta.items()}
+        )
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return ARROW_TYPE, sink.getvalue().to_pybytes()
+    rows = json.loads(frame.to_json(orient="records", date_format="iso"))
+    return encode_json({**meta, "rows": rows})
+
+
+def encode_json(payload):
+    return "application/json", json.dumps(payload).encode()
+
+
+def _response(content_type, body):
+    # Cached with its gzip encoding, so hits are not recompressed
+    compressed = gzip.compress(body, 6) if len(body) >= GZIP_MIN_BYTES else None
+    return {"type": content_type, "body": body, "gzip": compressed}
+
+
+def dimensions():
+    cube = get_cube()
+    values = {
+        name: sorted(cube[column].unique().tolist())
+        for name, column in DIMENSIONS.items()
+    }
+    return {
+        **values,
+        "months": [cube["month"].min().isoformat(), cube["month"].max().isoformat()],
+        "granularities": ["none"] + [name.lower() for name in GRANULARITIES],
+        "bases": list(BASES),
+        "stats": CUBE_STATS + ["median", "p<NN>"],
+    }
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, executor, responses):
+        self.executor = executor
+        self.responses = responses
+
+    async def cached(self, name, filters, params, compute):
+        # The store version is checked on the pool too: it may refresh the store
+        loop = asyncio.get_running_loop()
+        version = await loop.run_in_executor(self.executor, dataset_version)
+        return await loop.run_in_executor(
+            self.executor,
+            self.responses.get,
+            name,
+            version,
+            filters,
+            params,
+            lambda: _response(*compute(version)),
+        )
+
+    def send(self, response):
+        self.set_header("Content-Type", response["type"])
+        self.set_header("Vary", "Accept-Encoding")
+        accepts_gzip = "gzip" in self.request.headers.get("Accept-Encoding", "")
+        if response["gzip"] is not None and accepts_gzip:
+            self.set_header("Content-Encoding", "gzip")
+            self.finish(response["gzip"])
+        else:
+            self.finish(response["body"])
+
+    def write_error(self, status_code, **kwargs):
+        error = kwargs.get("exc_info", (None, None))[1]
+        message = str(error) if isinstance(error, QueryError) else self._reason
+        self.finish({"error": message})
+
+
+class HealthHandler(BaseHandler):
+    def get(self):
+        self.finish({"status": "ok"})
+
+
+class DimensionsHandler(BaseHandler):
+    async def get(self):
+        response = await self.cached(
+            "api:dimensions",
+            None,
+            (),
+            lambda version: encode_json({"version": version, **dimensions()}),
+        )
+        self.send(response)
+
+
+class PricesHandler(BaseHandler):
+    async def get(self):
+        try:
+            query = parse_query(self.request.arguments)
+        except QueryError as error:
+            raise tornado.web.HTTPError(400, reason=str(error)) from error
+        params = tuple(
+            (key, tuple(value) if isinstance(value, list) else value)
+            for key, value in query.items()
+            if key != "filters"
+        )
+
+        def compute(version):
+            frame, method = price_statistics(query)
+            meta = {"version": version, "method": method, "basis": query["basis"]}
+            return encode(frame, meta, query["format"])
+
+        self.send(await self.cached("api:prices", query["filters"], params, compute))
+
+
+def make_app(workers=API_WORKERS):
+    executor = ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix=f"{BACKGROUND_THREAD_PREFIX}api"
+    )
+    settings = {"executor": executor, "responses": DerivedCache()}
+    return tornado.web.Application(
+        [
+            (r"/v1/health", HealthHandler, settings),
+            (r"/v1/dimensions", DimensionsHandler, settings),
+            (r"/v1/prices", PricesHandler, settings),
+        ]
+    )
+
+
+async def serve(port, workers=API_WORKERS, address="127.0.0.1"):
+    app = make_app(workers)
+    app.listen(port, address=address)
+    await asyncio.Event().wait()
+
+
+@st.cache_resource
+def start_api_server():
+    # One server per process, on its own event loop so queries never wait on
+    # the Streamlit server's loop; another worker may already hold the port
+    if not API_PORT:
+        return None
+    started = threading.Event()
+    result = {}
+
+    def run():
+        async def listen():
+            try:
+                make_app().listen(API_PORT, address="127.0.0.1")
+                result["port"] = API_PORT
+            except OSError:
+                result["port"] = None
+            started.set()
+            if result["port"]:
+                await asyncio.Event().wait()
+
+        asyncio.run(listen())
+
+    threading.Thread(
+        target=run, name=f"{BACKGROUND_THREAD_PREFIX}api-server", daemon=True
+    ).start()
+    started.wait()
+    return result["port"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=API_WORKERS)
+    args = parser.parse_args()
+    print(f"Serving the query API on http://127.0.0.1:{args.port}/v1/")
+    asyncio.run(serve(args.port, args.workers))
+
+
+if __name__ == "__main__":
+    main()
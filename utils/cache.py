@@ -0,0 +1,209 @@
+import logging
+import os
+import threading
+
+import streamlit as st
+
+from utils.data import DISPLAY_NAMES
+from utils.cohorts import CohortComparison
+from utils.filters import FilterIndex
+from utils.forecast import FORECAST_FILE, load_forecasts
+from utils.grid import sort_order
+from utils.ingest import (
+    STORE_PATH,
+    load_cube,
+    load_markets,
+    load_sketch,
+    load_store,
+    refresh_store,
+)
+from utils.margins import align_price_types
+from utils.memo import DerivedCache
+from utils.normalize import PRICE_BASES
+from utils.metrics import cached_call, record_cache_miss
+from utils.timeseries import PriceSeries
+from utils.volatility import Volatility
+
+# Threads named with this prefix (the start-up warm-up, the query API) read the
+# caches outside any script run by design, so Streamlit's warning about their
+# missing script run context is dropped rather than logged on every lookup
+BACKGROUND_THREAD_PREFIX = "dashboard-"
+
+
+class _BackgroundThreadFilter(logging.Filter):
+    def filter(self, record):
+        return not threading.current_thread().name.startswith(BACKGROUND_THREAD_PREFIX)
+
+
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+    _BackgroundThreadFilter()
+)
+
+# Every resource is keyed on the store version, so a running app picks up newly
+# ingested partitions on the next rerun; max_entries=1 releases the old version.
+# Resources kept per price basis hold one entry per basis instead
+
+
+def dataset_version():
+    # Ingests any rows appended to the CSV since the last refresh
+    return refresh_store()
+
+
+# One dataset per process, shared read-only by every session and page
+@st.cache_resource(show_spinner="Loading dataset...", max_entries=1)
+def _dataset(version):
+    record_cache_miss("dataset")
+    return load_store()
+
+
+def get_dataset():
+    return cached_call("dataset", _dataset, dataset_version())
+
+
+def get_display_dataset():
+    # Lazy relabelling of the shared frame; no column data is copied
+    return get_dataset().rename(columns=DISPLAY_NAMES)
+
+
+# Display-order row positions per sorted column; a few columns and directions
+# are kept, so switching the dataset grid's sort back and forth is free
+@st.cache_resource(show_spinner="Sorting dataset...", max_entries=8)
+def _sort_order(version, column, descending):
+    record_cache_miss("sort_order")
+    return sort_order(
+        _dataset(version).rename(columns=DISPLAY_NAMES), column, descending
+    )
+
+
+def get_sort_order(column, descending=False):
+    return cached_call("sort_order", _sort_order, dataset_version(), column, descending)
+
+
+# Pre-aggregated sums, counts, minima and maxima that back the chart group-bys
+@st.cache_resource(show_spinner="Loading price cube...", max_entries=len(PRICE_BASES))
+def _cube(version, value_column="#value"):
+    record_cache_miss("cube")
+    return load_cube(value_column=value_column)
+
+
+def get_cube(value_column="#value"):
+    return cached_call("cube", _cube, dataset_version(), value_column)
+
+
+# Row positions per region, commodity, commodity type and price type
+@st.cache_resource(show_spinner="Indexing filters...", max_entries=1)
+def _filter_index(version):
+    record_cache_miss("filter_index")
+    return FilterIndex(_dataset(version))
+
+
+def get_filter_index():
+    return cached_call("filter_index", _filter_index, dataset_version())
+
+
+# Mergeable per-group quantile sketch behind the percentile and median metrics
+@st.cache_resource(show_spinner="Loading price sketch...", max_entries=len(PRICE_BASES))
+def _sketch(version, value_column="#value"):
+    record_cache_miss("sketch")
+    return load_sketch(value_column=value_column)
+
+
+def get_sketch(value_column="#value"):
+    return cached_call("sketch", _sketch, dataset_version(), value_column)
+
+
+# Monthly sums and counts per market x commodity x price type, with coordinates
+@st.cache_resource(show_spinner="Loading market table...", max_entries=1)
+def _markets(version):
+    record_cache_miss("markets")
+    return load_markets()
+
+
+def get_markets():
+    return cached_call("markets", _markets, dataset_version())
+
+
+# Monthly sums and counts per region x commodity x price type series
+@st.cache_resource(
+    show_spinner="Building price series...", max_entries=len(PRICE_BASES)
+)
+def _price_series(version, value_column="#value"):
+    record_cache_miss("price_series")
+    return PriceSeries(_cube(version, value_column))
+
+
+def get_price_series(value_column="#value"):
+    return cached_call("price_series", _price_series, dataset_version(), value_column)
+
+
+# Returns, volatility and spike flags of every market x commodity x price type
+@st.cache_resource(show_spinner="Computing price volatility...", max_entries=1)
+def _volatility(version):
+    record_cache_miss("volatility")
+    return Volatility(_markets(version))
+
+
+def get_volatility():
+    return cached_call("volatility", _volatility, dataset_version())
+
+
+# Retail and wholesale prices aligned on region, commodity, unit and month
+@st.cache_resource(
+    show_spinner="Aligning retail and wholesale prices...",
+    max_entries=len(PRICE_BASES),
+)
+def _margins(version, value_column="#value"):
+    record_cache_miss("margins")
+    return align_price_types(_dataset(version), value_column)
+
+
+def get_margins(value_column="#value"):
+    return cached_call("margins", _margins, dataset_version(), value_column)
+
+
+# Per-series totals and sketch counts that every cohort comparison reduces from
+@st.cache_resource(
+    show_spinner="Preparing cohort comparison...", max_entries=len(PRICE_BASES)
+)
+def _cohorts(version, value_column="#value"):
+    record_cache_miss("cohorts")
+    return CohortComparison(
+        _cube(version, value_column),
+        _sketch(version, value_column),
+        _price_series(version, value_column),
+    )
+
+
+def get_cohorts(value_column="#value"):
+    return cached_call("cohorts", _cohorts, dataset_version(), value_column)
+
+
+def forecast_version():
+    # The batch forecast job writes its table independently of ingest
+    try:
+        return os.stat(os.path.join(STORE_PATH, FORECAST_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+# Forecasts and intervals from the last batch run, or None before the first
+@st.cache_resource(max_entries=1)
+def _forecasts(version, forecast_version):
+    record_cache_miss("forecasts")
+    return load_forecasts()
+
+
+def get_forecasts():
+    return cached_call("forecasts", _forecasts, dataset_version(), forecast_version())
+
+
+# Chart data and figures derived from the resources above, shared by sessions
+@st.cache_resource
+def _derived_cache():
+    return DerivedCache()
+
+
+def derived(name, filters, compute, *params):
+    # compute() runs only when no session has asked for this name, canonical
+    # filter state and params since the dataset version last changed
+    return _derived_cache().get(name, dataset_version(), filters, params, compute)
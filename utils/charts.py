@@ -0,0 +1,332 @@
+import plotly.express as px
+import plotly.graph_objects as go
+
+from utils.cube import rollup
+from utils.data import DISPLAY_NAMES
+from utils.timeseries import GRANULARITIES
+from utils.volatility import RANKING_MEASURES
+
+# Chart data and figures for the dashboard pages, computed from the shared cube,
+# sketch and filtered rows so it can also be run without Streamlit (benchmarks,
+# exports) and cached across sessions
+
+RANKING_VIEWS = ["Top 5 Commodities", "Bottom 5 Commodities"]
+
+
+def average_price(cube, by, filters=None):
+    # Roll the cube up to the requested dimensions; the mean is sum / count
+    return rollup(cube, by, filters).rename(
+        columns={**DISPLAY_NAMES, "mean": "Price (PHP)"}
+    )
+
+
+def category_distribution(cube, filters=None):
+    return (
+        average_price(cube, ["#item+type"], filters)[["Commodity Type", "count"]]
+        .sort_values("count", ascending=False)
+        .set_axis(["Category", "Count"], axis=1)
+    )
+
+
+def commodity_ranking(cube, filters=None, view=RANKING_VIEWS[0], n=5):
+    commodity_averages = average_price(cube, ["#item+name"], filters)
+    if view == RANKING_VIEWS[0]:
+        return commodity_averages.nlargest(n, "Price (PHP)")
+    return commodity_averages.nsmallest(n, "Price (PHP)")
+
+
+def median_price(sketch, filters=None, df_filtered=None, column="Price (PHP)"):
+    # Exact median when the filtered rows are given, sketch estimate otherwise
+    if df_filtered is not None:
+        return df_filtered[column].median()
+    return sketch.quantiles([50], filters)[0]
+
+
+def latest_changes(price_series, filters=None):
+    # Latest YoY change per series, largest moves first, in percent for display
+    changes = (
+        price_series.latest_changes(filters)
+        .rename(columns=DISPLAY_NAMES)
+        .sort_values("YoY Change", key=abs, ascending=False)
+    )
+    changes["YoY Change"] = changes["YoY Change"] * 100
+    return changes
+
+
+def frequency_distribution(df, column):
+    # Categorical columns also count categories absent from the rows, so drop them
+    counts = df[column].value_counts()
+    counts = counts[counts > 0].reset_index()
+    counts.columns = [column, "Count"]
+    return counts
+
+
+def category_figure(category_counts):
+    # Pie chart with sorted categories and percentage labels
+    fig = px.pie(
+        category_counts,
+        values="Count",
+        names="Category",
+        title="Proportion of Food Categories",
+        hole=0.4,
+    )
+    fig.update_traces(textinfo="percent+label", sort=True)
+    return fig
+
+
+def region_commodity_figure(price_breakdown):
+    return px.bar(
+        price_breakdown,
+        x="Region",
+        y="Price (PHP)",
+        color="Commodity",
+        barmode="group",
+        title="Average Price by Region and Commodity",
+        labels={
+            "Region": "Region",
+            "Price (PHP)": "Price (PHP)",
+            "Commodity": "Commodity",
+        },
+    )
+
+
+def regional_price_figure(regional_price_breakdown, commodity):
+    return px.bar(
+        regional_price_breakdown,
+        x="Region",
+        y="Price (PHP)",
+        title=f"Average Price of {commodity} by Region",
+        labels={"Region": "Region", "Price (PHP)": "Price (PHP)"},
+    )
+
+
+def commodity_price_figure(commodity_price_breakdown, region):
+    return px.bar(
+        commodity_price_breakdown,
+        x="Commodity",
+        y="Price (PHP)",
+        title=f"Average Price of Commodities in {region}",
+        labels={"Commodity": "Commodity", "Price (PHP)": "Price (PHP)"},
+    )
+
+
+def price_type_figure(retail_vs_wholesale):
+    fig = px.bar(
+        retail_vs_wholesale,
+        x="Commodity",
+        y="Price (PHP)",
+        color="Price Type",
+        barmode="group",
+        title="Average Retail vs Wholesale Prices by Commodity",
+        labels={
+            "Commodity": "Commodity",
+            "Price (PHP)": "Price (PHP)",
+            "Price Type": "Price Type",
+        },
+    )
+    fig.update_layout(
+        plot_bgcolor="rgba(0,0,0,0)", xaxis_title="Commodity", yaxis_title="Price (PHP)"
+    )
+    return fig
+
+
+def ranking_figure(top_commodities, view):
+    return px.bar(
+        top_commodities,
+        x="Commodity",
+        y="Price (PHP)",
+        title=f"{view} by Average Price",
+        labels={"Commodity": "Commodity", "Price (PHP)": "Average Price (PHP)"},
+    )
+
+
+def trend_figure(price_trend, granularity, forecast=None, spike_counts=None):
+    fig = px.line(
+        price_trend,
+        x="Date",
+        y=["Price (PHP)", "Rolling Mean"],
+        title=f"Price Trend Over Time ({granularity})",
+        labels={"Date": "Date", "value": "Average Price (PHP)", "variable": ""},
+        markers=granularity != "Monthly",
+    )
+    fig.update_traces(
+        selector=dict(name="Rolling Mean"),
+        name=f"{GRANULARITIES[granularity]['window']}-period rolling mean",
+        line_dash="dash",
+        mode="lines",
+    )
+
+    # Mark periods in which the volatility engine flagged selected market series
+    if spike_counts is not None:
+        spikes = price_trend.merge(spike_counts, on="Date")
+        if len(spikes):
+            fig.add_trace(
+                go.Scatter(
+                    x=spikes["Date"],
+                    y=spikes["Price (PHP)"],
+                    customdata=spikes["Spiking series"],
+                    mode="markers",
+                    name="Market price spikes",
+                    marker=dict(symbol="x", size=10, color="#d62728"),
+                    hovertemplate="%{x|%b %Y}: %{customdata} market series "
+                    "spiked<extra></extra>",
+                )
+            )
+
+    # Forecast from the batch job with its 95% prediction interval as a band
+    if forecast is not None:
+        fig.add_trace(
+            go.Scatter(
+                x=forecast["Date"],
+                y=forecast["upper"],
+                mode="lines",
+                line=dict(width=0),
+                showlegend=False,
+                hoverinfo="skip",
+            )
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=forecast["Date"],
+                y=forecast["lower"],
+                mode="lines",
+                line=dict(width=0),
+                fill="tonexty",
+                fillcolor="rgba(99, 110, 250, 0.2)",
+                name="95% forecast interval",
+            )
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=forecast["Date"],
+                y=forecast["forecast"],
+                mode="lines",
+                line=dict(dash="dot"),
+                name="Forecast",
+            )
+        )
+    return fig
+
+
+def yoy_figure(price_trend, granularity):
+    fig = px.bar(
+        price_trend.dropna(subset=["YoY Change"]),
+        x="Date",
+        y="YoY Change",
+        title=f"Year-over-Year Change ({granularity})",
+        labels={"Date": "Date", "YoY Change": "Change vs. a year earlier"},
+    )
+    fig.update_layout(yaxis_tickformat=".0%")
+    return fig
+
+
+def volatility_figure(commodity_volatility, measure, n=10):
+    column = RANKING_MEASURES[measure]
+    return px.bar(
+        commodity_volatility.head(n).rename(columns=DISPLAY_NAMES),
+        x="Commodity",
+        y=column,
+        hover_data=["series", "spikes"],
+        title=f"Most Volatile Commodities by {measure}",
+        labels={
+            column: measure,
+            "series": "Market series",
+            "spikes": "Flagged spikes",
+        },
+    )
+
+
+def markup_box_figure(markup_distribution):
+    # Boxes from precomputed quantiles; whiskers span the 5th to 95th percentile
+    fig = go.Figure(
+        go.Box(
+            x=markup_distribution["Commodity"],
+            q1=markup_distribution["q1"],
+            median=markup_distribution["median"],
+            q3=markup_distribution["q3"],
+            lowerfence=markup_distribution["p5"],
+            upperfence=markup_distribution["p95"],
+            name="Markup",
+            boxpoints=False,
+        )
+    )
+    fig.update_layout(
+        title="Retail Markup over Wholesale by Commodity",
+        xaxis_title="Commodity",
+        yaxis_title="Retail / wholesale price",
+    )
+    return fig
+
+
+def markup_trend_figure(markup_trend):
+    fig = px.line(
+        markup_trend,
+        x="Date",
+        y=["Markup", "Rolling Mean"],
+        hover_data=["Pairs"],
+        title="Median Retail Markup over Wholesale Over Time",
+        labels={"Date": "Date", "value": "Retail / wholesale price", "variable": ""},
+    )
+    fig.update_traces(
+        selector=dict(name="Rolling Mean"),
+        name="12-month rolling mean",
+        line_dash="dash",
+    )
+    return fig
+
+
+def cohort_price_figure(cohort_metrics):
+    return px.bar(
+        cohort_metrics.melt(
+            id_vars="Cohort",
+            value_vars=["Average Price (PHP)", "Median Price (PHP)"],
+            var_name="Statistic",
+            value_name="Price (PHP)",
+        ),
+        x="Cohort",
+        y="Price (PHP)",
+        color="Statistic",
+        barmode="group",
+        title="Average and Median Price by Cohort",
+    )
+
+
+def cohort_trend_figure(cohort_trend, granularity):
+    # One line per cohort; the rolling means are dashed in the same colours
+    fig = px.line(
+        cohort_trend,
+        x="Date",
+        y="Price (PHP)",
+        color="Cohort",
+        title=f"Price Trend by Cohort ({granularity})",
+        labels={"Price (PHP)": "Average Price (PHP)"},
+        markers=granularity != "Monthly",
+    )
+    colors = {trace.name: trace.line.color for trace in fig.data}
+    window = GRANULARITIES[granularity]["window"]
+    for cohort, trend in cohort_trend.groupby("Cohort", sort=False):
+        fig.add_trace(
+            go.Scatter(
+                x=trend["Date"],
+                y=trend["Rolling Mean"],
+                mode="lines",
+                name=f"{cohort} ({window}-period rolling mean)",
+                legendgroup=cohort,
+                line=dict(color=colors.get(cohort), dash="dash"),
+                visible="legendonly",
+            )
+        )
+    return fig
+
+
+def cohort_yoy_figure(cohort_trend, granularity):
+    fig = px.line(
+        cohort_trend.dropna(subset=["YoY Change"]),
+        x="Date",
+        y="YoY Change",
+        color="Cohort",
+        title=f"Year-over-Year Change by Cohort ({granularity})",
+        labels={"YoY Change": "Change vs. a year earlier"},
+    )
+    fig.update_layout(yaxis_tickformat=".0%")
+    return fig
@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+
+from utils.cube import MEASURES
+from utils.memo import canonical_filters
+from utils.timeseries import SERIES_DIMENSIONS
+
+# A cohort is a named set of regions, commodities and price types; each maps a
+# dimension to its selected values, and None (or a missing key) keeps them all
+COHORT_DIMENSIONS = SERIES_DIMENSIONS
+
+# Administrative regions by island group, under the admin1 names of the WFP
+# export, for the default comparison; regions missing from the dataset are
+# ignored
+ISLAND_GROUPS = {
+    "Luzon": [
+        "National Capital region",
+        "Cordillera Administrative region",
+        "Ilocos",
+        "Cagayan Valley",
+        "Central Luzon",
+        "Calabarzon",
+        "Mimaropa",
+        "Bicol",
+    ],
+    "Visayas": ["Western Visayas", "Central Visayas", "Eastern Visayas"],
+    "Mindanao": [
+        "Zamboanga Peninsula",
+        "Northern Mindanao",
+        "Davao",
+        "Soccsksargen",
+        "Caraga",
+        "Bangsamoro",
+    ],
+}
+
+# Other names of the same regions (their official numbers, abbreviations and
+# the name of the Bangsamoro region before 2019), compared case-insensitively
+REGION_ALIASES = {
+    "ncr": "National Capital region",
+    "car": "Cordillera Administrative region",
+    "cordillera": "Cordillera Administrative region",
+    "region i": "Ilocos",
+    "region ii": "Cagayan Valley",
+    "region iii": "Central Luzon",
+    "region iv-a": "Calabarzon",
+    "region iv-b": "Mimaropa",
+    "region v": "Bicol",
+    "region vi": "Western Visayas",
+    "region vii": "Central Visayas",
+    "region viii": "Eastern Visayas",
+    "region ix": "Zamboanga Peninsula",
+    "region x": "Northern Mindanao",
+    "region xi": "Davao",
+    "region xii": "Soccsksargen",
+    "region xiii": "Caraga",
+    "armm": "Bangsamoro",
+    "barmm": "Bangsamoro",
+    "autonomous region in muslim mindanao": "Bangsamoro",
+}
+
+REGION_GROUPS = {
+    region.casefold(): group
+    for group, members in ISLAND_GROUPS.items()
+    for region in members
+}
+
+
+def island_group(region):
+    # Island group of an admin1 name or alias, or None for an unknown region
+    name = " ".join(str(region).split()).casefold()
+    name = REGION_ALIASES.get(name, name).casefold()
+    return REGION_GROUPS.get(name)
+
+
+def island_group_cohorts(regions):
+    # One cohort per island group with at least one region in the dataset
+    cohorts = {}
+    for region in sorted(regions):
+        group = island_group(region)
+        if group is not None:
+            cohorts.setdefault(group, {"#adm1+name": []})["#adm1+name"].append(region)
+    return {group: cohorts[group] for group in ISLAND_GROUPS if group in cohorts}
+
+
+def cohort_key(cohorts):
+    # Canonical, hashable form of the cohorts for the derived-result cache
+    return tuple(
+        (name, canonical_filters(filters)) for name, filters in cohorts.items()
+    )
+
+
+def membership(frame, cohorts):
+    # Rows x cohorts matrix, 1 where a row belongs to the cohort. Each column's
+    # distinct values are matched against every cohort once, and the rows look
+    # their flags up by code, so no per-cohort filtered copy is made
+    matrix = np.ones((len(frame), len(cohorts)), dtype=bool)
+    for column in COHORT_DIMENSIONS:
+        codes, values = pd.factorize(frame[column])
+        # The extra last row is the flags of missing values (code -1)
+        allowed = np.zeros((len(values) + 1, len(cohorts)), dtype=bool)
+        for j, filters in enumerate(cohorts.values()):
+            selected = filters.get(column)
+            if selected is None or "ALL" in selected:
+                allowed[:, j] = True
+            else:
+                allowed[:-1, j] = pd.Index(values).isin(selected)
+        matrix &= allowed[codes]
+    return matrix.astype("float64")
+
+
+class CohortComparison:
+    """Per-series totals that the metrics and trends of any cohorts reduce from.
+
+    The cube is collapsed to the sums, counts, minima and maxima of each region
+    x commodity x price type series, and the quantile sketch to a dense series
+    x bucket count matrix. The statistics of N cohorts are then products of
+    their series x N membership matrix with these tables and with the monthly
+    price series, one pass over the series whatever the number of cohorts,
+    even when cohorts overlap.
+    """
+
+    def __init__(self, cube, sketch, price_series):
+        self.totals = (
+            cube.groupby(COHORT_DIMENSIONS, observed=True).agg(MEASURES).reset_index()
+        )
+
+        counts = sketch.table.groupby(COHORT_DIMENSIONS + ["bucket"], observed=True)[
+            "count"
+        ].sum()
+        group_ids, groups = counts.index.droplevel("bucket").factorize()
+        bucket_ids, buckets = pd.factorize(
+            counts.index.get_level_values("bucket"), sort=True
+        )
+        self.sketch_groups = groups.to_frame(index=False, name=COHORT_DIMENSIONS)
+        self.bucket_counts = np.zeros((len(groups), len(buckets)))
+        self.bucket_counts[group_ids, bucket_ids] = counts.to_numpy()
+        self.bucket_values = sketch.bucket_value(np.asarray(buckets))
+
+        self.price_series = price_series
+
+    def medians(self, cohorts):
+        # Merged sketch of each cohort, then the rank search on every row at
+        # once, interpolated between the ranks either side as the sketch does
+        counts = membership(self.sketch_groups, cohorts).T @ self.bucket_counts
+        cumulative = counts.cumsum(axis=1)
+        ranks = 0.5 * (cumulative[:, -1:] - 1)
+
+        def value(rank):
+            positions = (cumulative <= rank).sum(axis=1)
+            return self.bucket_values[np.minimum(positions, counts.shape[1] - 1)]
+
+        lower = np.floor(ranks)
+        below, above = value(lower), value(np.ceil(ranks))
+        medians = below + (ranks - lower)[:, 0] * (above - below)
+        return np.where(cumulative[:, -1] > 0, medians, np.nan)
+
+    def metrics(self, cohorts):
+        weights = membership(self.totals, cohorts)
+        measures = self.totals[["sum", "sumsq", "count"]].to_numpy(dtype="float64")
+        sums, sumsq, count = (weights.T @ measures).T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = sums / count
+            variance = (sumsq - count * mean**2) / (count - 1)
+
+        # Extremes are reductions over the same membership, masked per cohort
+        members = weights.astype(bool)
+        minimum = np.where(members, self.totals[["min"]].to_numpy(), np.inf).min(0)
+        maximum = np.where(members, self.totals[["max"]].to_numpy(), -np.inf).max(0)
+        observed = count > 0
+        return pd.DataFrame(
+            {
+                "Cohort": list(cohorts),
+                "Series": members.sum(axis=0),
+                "Observations": count.astype(int),
+                "Average Price (PHP)": mean,
+                "Median Price (PHP)": self.medians(cohorts),
+                "Std": np.sqrt(np.maximum(variance, 0)),
+                "Min": np.where(observed, minimum, np.nan),
+                "Max": np.where(observed, maximum, np.nan),
+            }
+        )
+
+    def trends(self, cohorts, granularity="Yearly"):
+        # Every cohort's trend in the long format of an overlaid line chart
+        weights = membership(self.price_series.series, cohorts)
+        dates, counts, prices, rolling, changes = self.price_series.grouped_trend(
+            weights, granularity
+        )
+        trend = pd.DataFrame(
+            {
+                "Date": np.repeat(dates, len(cohorts)),
+                "Cohort": np.tile(list(cohorts), len(dates)),
+                "Price (PHP)": prices.ravel(),
+                "Rolling Mean": rolling.ravel(),
+                "YoY Change": changes.ravel(),
+            }
+        )
+        return trend[counts.ravel() > 0].reset_index(drop=True)
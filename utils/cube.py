@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+# Dimensions of the pre-aggregated cube; every chart filter and group-by on the
+# Visualization page is a combination of these
+CUBE_DIMENSIONS = [
+    "#adm1+name",
+    "#item+name",
+    "#item+price+type",
+    "#item+type",
+    "month",
+]
+
+# How each measure combines when groups are rolled up; sumsq backs the std
+MEASURES = {"sum": "sum", "sumsq": "sum", "count": "sum", "min": "min", "max": "max"}
+
+
+def month_start(dates):
+    # Truncate timestamps to the first day of their month without going through periods
+    return dates.to_numpy().astype("datetime64[M]").astype("datetime64[ns]")
+
+
+def build_cube(df, value_column="#value"):
+    keys = {column: df[column] for column in CUBE_DIMENSIONS[:-1]}
+    keys["month"] = month_start(df["#date"])
+    values = df[value_column].astype("float64")
+    frame = pd.DataFrame({"value": values, "square": values**2})
+    cube = frame.groupby(list(keys.values()), observed=True, sort=False).agg(
+        sum=("value", "sum"),
+        sumsq=("square", "sum"),
+        count=("value", "count"),
+        min=("value", "min"),
+        max=("value", "max"),
+    )
+    cube.index.names = CUBE_DIMENSIONS
+    return with_year(cube.reset_index())
+
+
+def with_year(cube):
+    cube["year"] = (
+        cube["month"].to_numpy().astype("datetime64[Y]").astype("datetime64[ns]")
+    )
+    return cube
+
+
+def merge_cubes(*cubes):
+    # Cubes of disjoint row sets combine group by group, e.g. when rows are appended
+    combined = pd.concat(cubes, ignore_index=True)
+    for column in CUBE_DIMENSIONS[:-1]:
+        combined[column] = combined[column].astype("category")
+    merged = combined.groupby(CUBE_DIMENSIONS, observed=True, sort=False).agg(MEASURES)
+    return with_year(merged.reset_index())
+
+
+def select(cube, filters=None):
+    # Filters map a cube column to the selected values; None means no restriction
+    mask = np.ones(len(cube), dtype=bool)
+    for column, values in (filters or {}).items():
+        if values is not None:
+            mask &= cube[column].isin(values).to_numpy()
+    return cube[mask]
+
+
+def rollup(cube, by, filters=None):
+    subset = select(cube, filters)
+    if not by:
+        totals = subset[list(MEASURES)].agg(MEASURES).to_frame().T
+    else:
+        totals = subset.groupby(by, observed=True).agg(MEASURES).reset_index()
+    totals["mean"] = totals["sum"] / totals["count"]
+    return totals
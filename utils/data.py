@@ -0,0 +1,104 @@
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+# The loaded dataset is shared by every session, so derived frames (renames,
+# column subsets, unfiltered selections) must be lazy views rather than copies
+pd.set_option("mode.copy_on_write", True)
+
+# Raw WFP export (HDX format: the second row holds the HXL tags used as column names)
+CSV_PATH = "data/wfp_food_prices_phl.csv"
+
+DATE_COLUMN = "#date"
+
+# Low-cardinality text columns stored as categoricals
+CATEGORICAL_COLUMNS = [
+    "#adm1+name",
+    "#adm2+name",
+    "#loc+market+name",
+    "#item+type",
+    "#item+name",
+    "#item+unit",
+    "#item+unit+std",
+    "#item+price+flag",
+    "#item+price+type",
+    "#currency",
+]
+
+# Prices only need float32 precision
+FLOAT32_COLUMNS = ["#value", "#value+usd"]
+
+# User-friendly column labels; renaming under copy-on-write does not copy data
+DISPLAY_NAMES = {
+    "#date": "Date",
+    "#adm1+name": "Region",
+    "#adm2+name": "Subregion",
+    "#loc+market+name": "Market Name",
+    "#geo+lat": "Latitude",
+    "#geo+lon": "Longitude",
+    "#item+type": "Commodity Type",
+    "#item+name": "Commodity",
+    "#item+unit": "Unit",
+    "#item+price+flag": "Price Flag",
+    "#item+price+type": "Price Type",
+    "#currency": "Currency",
+    "#value": "Price (PHP)",
+    "#value+usd": "Price (USD)",
+    "#item+unit+std": "Standard Unit",
+    "#value+std": "Price per Standard Unit (PHP)",
+    "#value+usd+std": "Price per Standard Unit (USD)",
+    "#value+std+real": "Real Price per Standard Unit (2018 PHP)",
+}
+
+CSV_DTYPES = {
+    **{column: "category" for column in CATEGORICAL_COLUMNS},
+    **{column: "float32" for column in FLOAT32_COLUMNS},
+    "#geo+lat": "float64",
+    "#geo+lon": "float64",
+}
+
+
+def read_csv(source=CSV_PATH, names=None):
+    # Without names the source is a full export whose second row holds the HXL
+    # tags; with names it is a headerless run of rows appended to an export
+    if names is None:
+        names = pd.read_csv(source, skiprows=1, nrows=0).columns.tolist()
+        options = {"skiprows": 2}
+        # A buffer is read again from the start for the rows
+        if hasattr(source, "seek"):
+            source.seek(0)
+    else:
+        options = {}
+    # Only apply dtypes to the columns the export actually has
+    dtypes = {column: dtype for column, dtype in CSV_DTYPES.items() if column in names}
+    return pd.read_csv(
+        source,
+        header=None,
+        names=names,
+        dtype=dtypes,
+        parse_dates=[DATE_COLUMN],
+        cache_dates=True,
+        **options,
+    )
+
+
+def restore_categoricals(df):
+    # Concatenating frames with different categories falls back to object columns
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns and df[column].dtype != "category":
+            df[column] = df[column].astype("category")
+    return df
+
+
+def write_parquet(df, path):
+    # Write to a hidden temporary file first so readers (including directory
+    # scans of a partitioned store) never see a half-written file
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{name}.tmp")
+    df.to_parquet(tmp_path, engine="pyarrow", index=False)
+    os.replace(tmp_path, path)
+
+
+def read_parquet(path):
+    return pq.read_table(path, memory_map=True).to_pandas()
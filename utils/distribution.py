@@ -0,0 +1,78 @@
+import numpy as np
+import plotly.graph_objects as go
+
+# Maximum number of individual outlier points sent to the browser per chart
+DEFAULT_POINT_BUDGET = 1000
+
+DEFAULT_BINS = 50
+
+
+def box_statistics(values, quartiles, point_budget=DEFAULT_POINT_BUDGET, seed=0):
+    # Tukey box from precomputed quartiles; only the outliers need a row pass
+    values = values[~np.isnan(values)]
+    q1, median, q3 = quartiles
+    iqr = q3 - q1
+    low, high = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+    inside = values[(values >= low) & (values <= high)]
+    outliers = values[(values < low) | (values > high)]
+    outlier_count = len(outliers)
+    if outlier_count > point_budget:
+        # Keep the extremes and a reproducible random sample of the rest
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(outlier_count, size=max(point_budget - 2, 0), replace=False)
+        extremes = [outliers.min(), outliers.max()]
+        outliers = np.concatenate([outliers[sample], extremes])[:point_budget]
+
+    return {
+        "q1": q1,
+        "median": median,
+        "q3": q3,
+        "lowerfence": inside.min() if len(inside) else q1,
+        "upperfence": inside.max() if len(inside) else q3,
+        "outliers": np.sort(outliers),
+        "outlier_count": outlier_count,
+    }
+
+
+def box_figure(stats, name, title):
+    fig = go.Figure()
+    fig.add_trace(
+        go.Box(
+            x=[name],
+            q1=[stats["q1"]],
+            median=[stats["median"]],
+            q3=[stats["q3"]],
+            lowerfence=[stats["lowerfence"]],
+            upperfence=[stats["upperfence"]],
+            name=name,
+            boxpoints=False,
+        )
+    )
+    if len(stats["outliers"]):
+        fig.add_trace(
+            go.Scatter(
+                x=[name] * len(stats["outliers"]),
+                y=stats["outliers"],
+                mode="markers",
+                name="Outliers",
+                marker=dict(size=4, opacity=0.6),
+            )
+        )
+    fig.update_layout(title=title, yaxis_title=name, showlegend=False)
+    return fig
+
+
+def histogram_figure(values, name, title, bins=DEFAULT_BINS):
+    # Bin on the server and send only the bar heights
+    counts, edges = np.histogram(values[~np.isnan(values)], bins=bins)
+    fig = go.Figure(
+        go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts,
+            width=np.diff(edges),
+            name=name,
+        )
+    )
+    fig.update_layout(title=title, xaxis_title=name, yaxis_title="Count", bargap=0)
+    return fig
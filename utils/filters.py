@@ -0,0 +1,55 @@
+import numpy as np
+
+# Categorical columns that the sidebar filters can restrict
+FILTER_COLUMNS = ["#adm1+name", "#item+name", "#item+type", "#item+price+type"]
+
+
+class FilterIndex:
+    """Inverted index from each category value to the sorted row positions holding it.
+
+    A multiselect combination is resolved by unioning the position arrays of the
+    selected values within a column, intersecting across columns, and taking the
+    resulting rows once.
+    """
+
+    def __init__(self, df, columns=FILTER_COLUMNS):
+        self.size = len(df)
+        self.positions = {}
+        for column in columns:
+            categorical = df[column].cat
+            codes = categorical.codes.to_numpy()
+            # A stable sort keeps row positions ascending within each value
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(
+                codes[order], np.arange(len(categorical.categories) + 1)
+            )
+            self.positions[column] = {
+                value: order[bounds[i] : bounds[i + 1]]
+                for i, value in enumerate(categorical.categories)
+            }
+
+    def lookup(self, filters):
+        # Returns None when no filter restricts the rows
+        result = None
+        for column, values in filters.items():
+            if values is None:
+                continue
+            index = self.positions[column]
+            parts = [index[value] for value in values if value in index]
+            if parts:
+                # Values are disjoint, so the union is a plain merge of sorted arrays
+                matched = np.sort(np.concatenate(parts))
+            else:
+                matched = np.empty(0, dtype=np.intp)
+            if result is None:
+                result = matched
+            else:
+                result = np.intersect1d(result, matched, assume_unique=True)
+        return result
+
+    def apply(self, df, filters):
+        positions = self.lookup(filters)
+        # "ALL" everywhere returns the shared frame itself, without a copy
+        if positions is None:
+            return df
+        return df.take(positions)
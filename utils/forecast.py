@@ -0,0 +1,281 @@
+"""Batch price forecasts for every region x commodity x price type series.
+
+Each series is fitted with a lightweight seasonal model on its log monthly
+prices: a linear trend plus one effect per calendar month, by least squares
+over at most the last ten years. Forecasts and 95% prediction intervals for the
+twelve months after the dataset ends are stored in a columnar table next to the
+store. Series are fitted in parallel across a process pool. The fitted models
+are stored too, keyed by a hash of each series' data, so only series whose
+monthly data changed are refitted; the rest are projected onto the new horizon.
+
+    python -m utils.forecast --workers 8
+"""
+
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.data import read_parquet, restore_categoricals, write_parquet
+from utils.ingest import STORE_PATH, load_cube, refresh_store
+from utils.cube import select
+from utils.timeseries import SERIES_DIMENSIONS, PriceSeries
+
+FORECAST_FILE = "forecasts.parquet"
+
+# Fitted model of each series, keyed by the hash of the data it was fitted to
+MODEL_FILE = "forecast_models.parquet"
+MODEL_COLUMNS = [
+    "series_id",
+    "last_month",
+    "origin",
+    "sigma",
+    "coefficients",
+    "covariance",
+]
+
+HORIZON = 12
+MAX_HISTORY = 120
+MIN_OBSERVATIONS = 24
+
+# Series whose last observation is older than this are not extrapolated
+MAX_STALENESS = 12
+
+# Two-sided 95% normal quantile for the prediction intervals
+INTERVAL_Z = 1.959964
+
+# Series per task submitted to the pool
+CHUNK_SIZE = 256
+
+
+def series_hashes(series):
+    # Digest of each series' key and observed months, sums and counts; a series
+    # keeps its digest while other series receive new months
+    hashes = []
+    observed = series.counts > 0
+    months = series.months.asi8
+    keys = series.series.astype(str).agg("|".join, axis=1)
+    for column, key in enumerate(keys):
+        rows = observed[:, column]
+        digest = hashlib.sha1(key.encode())
+        digest.update(months[rows].tobytes())
+        digest.update(series.sums[rows, column].tobytes())
+        digest.update(series.counts[rows, column].tobytes())
+        hashes.append(digest.hexdigest())
+    return hashes
+
+
+def _design(month_numbers, origin):
+    # Intercept, linear trend in years and eleven calendar-month effects
+    t = (month_numbers - origin) / 12
+    calendar = month_numbers % 12
+    dummies = (calendar[:, None] == np.arange(1, 12)).astype("float64")
+    return np.column_stack([np.ones(len(t)), t, dummies])
+
+
+def fit_series(month_numbers, prices):
+    # Returns the fitted model (origin, coefficients, residual sigma and the
+    # unscaled coefficient covariance), or None when there is too little data
+    keep = prices > 0
+    month_numbers, prices = (
+        month_numbers[keep][-MAX_HISTORY:],
+        prices[keep][-MAX_HISTORY:],
+    )
+    if len(prices) < MIN_OBSERVATIONS:
+        return None
+
+    origin = month_numbers[-1]
+    X = _design(month_numbers, origin)
+    y = np.log(prices)
+    coefficients, _, rank, _ = np.linalg.lstsq(X, y, rcond=None)
+    dof = len(y) - rank
+    if dof <= 0:
+        return None
+    residuals = y - X @ coefficients
+    sigma = np.sqrt(residuals @ residuals / dof)
+    return origin, coefficients, sigma, np.linalg.pinv(X.T @ X)
+
+
+def project(models, forecast_months):
+    # Forecast, lower and upper (models x months) of fitted models; the
+    # prediction variance includes the uncertainty of the fitted coefficients
+    origins = models["origin"].to_numpy()
+    coefficients = np.stack(models["coefficients"].to_numpy())
+    parameters = coefficients.shape[1]
+    covariance = np.stack(models["covariance"].to_numpy()).reshape(
+        -1, parameters, parameters
+    )
+    X = np.stack([_design(forecast_months, origin) for origin in origins]).reshape(
+        len(origins), len(forecast_months), parameters
+    )
+    mean = np.einsum("smp,sp->sm", X, coefficients)
+    leverage = np.einsum("smp,spq,smq->sm", X, covariance, X)
+    spread = INTERVAL_Z * models["sigma"].to_numpy()[:, None] * np.sqrt(1 + leverage)
+    return np.exp(mean), np.exp(mean - spread), np.exp(mean + spread)
+
+
+def _fit_chunk(tasks):
+    results = []
+    for index, month_numbers, prices in tasks:
+        fitted = fit_series(month_numbers, prices)
+        last_month = month_numbers[-1] if len(month_numbers) else -1
+        if fitted is None:
+            results.append((index, last_month, 0, np.nan, None, None))
+        else:
+            origin, coefficients, sigma, covariance = fitted
+            results.append((index, last_month, origin, sigma, coefficients, covariance))
+    return results
+
+
+def _month_numbers(months):
+    # Months since 1970-01 as integers, so calendar month is number % 12
+    return months.year.to_numpy() * 12 + months.month.to_numpy() - 1 - 1970 * 12
+
+
+def fit_models(series, indices=None, workers=None, chunk_size=CHUNK_SIZE):
+    # One model row per given series (all by default). Series too short to fit
+    # get a row with a NaN sigma, so they are not retried until their data changes
+    months = _month_numbers(series.months)
+    means = series.means
+
+    tasks = []
+    for index in range(len(series.series)) if indices is None else indices:
+        observed = np.flatnonzero(series.counts[:, index] > 0)
+        tasks.append((index, months[observed], means[observed, index]))
+    chunks = [tasks[i : i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+
+    results = []
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            results.extend(_fit_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for fitted in pool.map(_fit_chunk, chunks):
+                results.extend(fitted)
+
+    models = pd.DataFrame(results, columns=MODEL_COLUMNS)
+    models["covariance"] = [
+        None if covariance is None else covariance.ravel()
+        for covariance in models["covariance"]
+    ]
+    return models
+
+
+def forecast_table(series, models):
+    # Forecast rows for the twelve months after the dataset ends, from the
+    # fitted models of series observed recently enough to extrapolate
+    months = _month_numbers(series.months)
+    forecast_dates = pd.date_range(
+        series.months[-1] + pd.offsets.MonthBegin(), periods=HORIZON, freq="MS"
+    )
+    current = models["sigma"].notna() & (
+        models["last_month"] >= months[-1] - MAX_STALENESS
+    )
+    models = models[current]
+
+    indices = np.repeat(models["series_id"].to_numpy(), HORIZON).astype(int)
+    table = series.series.iloc[indices].reset_index(drop=True)
+    table["series_id"] = indices
+    table["month"] = np.tile(forecast_dates, len(models))
+    if len(models):
+        bounds = project(models, _month_numbers(forecast_dates))
+    else:
+        bounds = [np.empty(0)] * 3
+    for column, values in zip(["forecast", "lower", "upper"], bounds):
+        table[column] = np.ravel(values)
+    return table
+
+
+def forecast_all(series, indices=None, workers=None, chunk_size=CHUNK_SIZE):
+    # Fits the given series (all by default) and returns their forecast rows
+    return forecast_table(series, fit_models(series, indices, workers, chunk_size))
+
+
+def run(workers=None, store_path=STORE_PATH):
+    # Refits only the series whose data changed, and projects every stored
+    # model onto the months after the dataset ends, so a release that adds a
+    # month re-projects unchanged series rather than refitting them
+    output = os.path.join(store_path, FORECAST_FILE)
+    models_path = os.path.join(store_path, MODEL_FILE)
+    series = PriceSeries(load_cube(store_path))
+    hashes = np.array(series_hashes(series))
+
+    kept = None
+    if os.path.exists(models_path):
+        previous = read_parquet(models_path)
+        kept = previous[previous["series_hash"].isin(hashes)]
+    reused = set() if kept is None else set(kept["series_hash"])
+    stale = [i for i, digest in enumerate(hashes) if digest not in reused]
+
+    start = time.perf_counter()
+    fitted = fit_models(series, stale, workers)
+    seconds = time.perf_counter() - start
+    fitted["series_hash"] = hashes[fitted.pop("series_id").to_numpy(dtype=int)]
+
+    if kept is not None and len(fitted):
+        models = pd.concat([kept, fitted], ignore_index=True)
+    else:
+        models = fitted if kept is None else kept.reset_index(drop=True)
+    write_parquet(models, models_path)
+
+    # Stored models are keyed by data hash; series positions change between runs
+    positions = pd.Index(hashes).get_indexer(models["series_hash"])
+    table = forecast_table(series, models.assign(series_id=positions))
+    table["series_hash"] = hashes[table.pop("series_id").to_numpy()]
+    write_parquet(restore_categoricals(table), output)
+    return {
+        "series": len(hashes),
+        "refitted": len(stale),
+        "forecasts": table["series_hash"].nunique(),
+        "seconds": seconds,
+    }
+
+
+def load_forecasts(store_path=STORE_PATH):
+    # None until the batch job has run for this store
+    path = os.path.join(store_path, FORECAST_FILE)
+    return read_parquet(path) if os.path.exists(path) else None
+
+
+def selection_forecast(forecasts, series, filters=None):
+    # Forecast of a selection's average price: each selected series' forecast
+    # weighted by its observations over the last year, like the trend itself
+    # weights series by observations. Bounds are combined the same way, which
+    # assumes the series' errors move together and so errs on the wide side
+    if forecasts is None:
+        return None
+    selected = select(forecasts, filters)
+    if selected.empty:
+        return None
+    recent = series.counts[-12:].sum(axis=0)
+    weights = series.series.assign(weight=recent)
+    selected = selected.merge(weights, on=SERIES_DIMENSIONS, how="inner")
+    selected = selected[selected["weight"] > 0]
+    if selected.empty:
+        return None
+    weighted = selected[["forecast", "lower", "upper"]].mul(selected["weight"], axis=0)
+    totals = weighted.groupby(selected["month"]).sum()
+    combined = totals.div(selected.groupby("month")["weight"].sum(), axis=0)
+    return combined.rename_axis("Date").reset_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    refresh_store()
+    result = run(args.workers)
+    rate = result["refitted"] / result["seconds"] if result["seconds"] else 0
+    print(
+        f"{result['refitted']:,} of {result['series']:,} series refitted in "
+        f"{result['seconds']:.2f}s ({rate:,.0f} series/s), "
+        f"{result['forecasts']:,} series forecast"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+# Windowed view of the shared dataset: rows are addressed by position, sorted
+# and filtered as position arrays, and only the visible page is ever copied
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def sort_order(df, column, descending=False):
+    # Row positions of df ordered by column, missing values last; categoricals
+    # sort by label rather than by the order their categories were first seen
+    values = df[column].reset_index(drop=True)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.cat.reorder_categories(values.cat.categories.sort_values())
+    ordered = values.sort_values(
+        ascending=not descending, kind="stable", na_position="last"
+    )
+    return ordered.index.to_numpy()
+
+
+def search(df, column, text, positions=None):
+    # Positions whose column contains text, case-insensitively; categoricals
+    # match their labels once and then compare integer codes
+    values = df[column]
+    if positions is None:
+        positions = np.arange(len(df))
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        labels = values.cat.categories.astype(str)
+        matching = np.flatnonzero(labels.str.contains(text, case=False, regex=False))
+        codes = values.cat.codes.to_numpy()[positions]
+        return positions[np.isin(codes, matching)]
+    rows = values.take(positions).astype(str)
+    return positions[rows.str.contains(text, case=False, regex=False).to_numpy()]
+
+
+def window(size, filtered=None, order=None):
+    # Positions of the visible rows in display order; filtered is the sorted
+    # positions kept by the filters (None keeps all) and order a full sort order
+    if order is None:
+        return np.arange(size) if filtered is None else filtered
+    if filtered is None:
+        return order
+    keep = np.zeros(size, dtype=bool)
+    keep[filtered] = True
+    return order[keep[order]]
+
+
+def page_count(rows, page_size):
+    return max(1, -(-rows // page_size))
+
+
+def page(df, positions, columns, number, page_size):
+    # Copies only the requested columns of the rows on one page (numbered from 1)
+    start = (number - 1) * page_size
+    return df[columns].take(positions[start : start + page_size])
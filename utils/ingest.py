@@ -0,0 +1,320 @@
+"""Date-partitioned columnar store of the WFP export, refreshed incrementally.
+
+The store keeps one Parquet file per month, with prices normalized to a
+standard unit (and to constant pesos) on the way in, the persisted price cube
+and quantile sketch of each price basis, the per-market table, and a manifest
+recording how much of the CSV has been ingested. When a new WFP release only appends rows, just those bytes are
+parsed: the touched month partitions are rewritten and the persisted aggregates
+are updated by merging in those of the new rows. Any other change re-partitions
+the export and rewrites only the months whose content changed.
+
+    python -m utils.ingest
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from utils.cube import build_cube, merge_cubes, month_start
+from utils.data import (
+    CSV_PATH,
+    DATE_COLUMN,
+    read_csv,
+    read_parquet,
+    restore_categoricals,
+    write_parquet,
+)
+from utils.markets import build_market_table, merge_market_tables
+from utils.normalize import PRICE_BASES, normalize_prices
+from utils.quantiles import QuantileSketch
+
+# Bump whenever the store layout changes so stale stores are rebuilt
+STORE_VERSION = 4
+STORE_PATH = f"data/wfp_food_prices_phl.v{STORE_VERSION}"
+
+# Bytes just before the ingested offset that must be unchanged to treat the
+# CSV as appended to rather than rewritten
+TAIL_BYTES = 64 * 1024
+
+# Serialises refreshes triggered by concurrent sessions in one process
+_lock = threading.Lock()
+
+
+def _paths(store_path):
+    return {
+        "manifest": os.path.join(store_path, "manifest.json"),
+        "partitions": os.path.join(store_path, "partitions"),
+        "markets": os.path.join(store_path, "markets.parquet"),
+    }
+
+
+def _basis_path(store_path, kind, value_column):
+    # cube.parquet and sketch.parquet for #value, cube+std.parquet and so on
+    suffix = value_column.removeprefix("#value")
+    return os.path.join(store_path, f"{kind}{suffix}.parquet")
+
+
+def partition_path(store_path, key):
+    return os.path.join(_paths(store_path)["partitions"], f"{key}.parquet")
+
+
+def read_manifest(store_path=STORE_PATH):
+    try:
+        with open(_paths(store_path)["manifest"]) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(manifest, store_path=STORE_PATH):
+    path = _paths(store_path)["manifest"]
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def content_hash(df):
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+
+def split_partitions(df):
+    # One partition per calendar month of #date
+    months = month_start(df[DATE_COLUMN])
+    for month, part in df.groupby(months, sort=True):
+        yield pd.Timestamp(month).strftime("%Y-%m"), part
+
+
+def _complete_size(csv_path):
+    # Size up to the last newline, so a release still being written is not half-read
+    size = os.path.getsize(csv_path)
+    with open(csv_path, "rb") as f:
+        f.seek(max(size - TAIL_BYTES, 0))
+        tail = f.read()
+    return size - len(tail) + tail.rfind(b"\n") + 1
+
+
+class _BoundedFile(io.RawIOBase):
+    """Read-only view of the bytes of an open file between two offsets.
+
+    Reads stop at the end offset as if the file ended there, and seeks are
+    relative to the start offset, so pandas can stream a byte range of the CSV
+    without it being copied into memory first.
+    """
+
+    def __init__(self, f, start, end):
+        self.f = f
+        self.start = start
+        self.end = end
+        self.position = start
+        f.seek(start)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        view = memoryview(buffer)[: max(self.end - self.position, 0)]
+        count = self.f.readinto(view)
+        self.position += count
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: self.start, io.SEEK_CUR: self.position}.get(
+            whence, self.end
+        )
+        self.position = min(max(base + offset, self.start), self.end)
+        self.f.seek(self.position)
+        return self.position - self.start
+
+    def tell(self):
+        return self.position - self.start
+
+
+def _read_complete(csv_path, start, size, names=None):
+    # Parses only the bytes up to size, leaving a partly written last row for
+    # the refresh after its release is complete
+    with open(csv_path, "rb") as f:
+        return read_csv(io.BufferedReader(_BoundedFile(f, start, size)), names=names)
+
+
+def _tail_hash(csv_path, offset):
+    with open(csv_path, "rb") as f:
+        f.seek(max(offset - TAIL_BYTES, 0))
+        return hashlib.sha1(f.read(min(offset, TAIL_BYTES))).hexdigest()
+
+
+def _csv_state(csv_path, size):
+    stat = os.stat(csv_path)
+    return {
+        "csv_size": stat.st_size,
+        "csv_mtime": stat.st_mtime,
+        "csv_offset": size,
+        "tail_hash": _tail_hash(csv_path, size),
+    }
+
+
+def _write_partitions(df, store_path, partitions, merge_existing):
+    # Returns the keys of the months present in df and of those (re)written
+    keys, written = [], []
+    for key, part in split_partitions(df):
+        keys.append(key)
+        path = partition_path(store_path, key)
+        if merge_existing and key in partitions:
+            part = restore_categoricals(
+                pd.concat([read_parquet(path), part], ignore_index=True)
+            )
+        digest = content_hash(part)
+        if partitions.get(key, {}).get("hash") == digest and os.path.exists(path):
+            continue
+        write_parquet(part, path)
+        partitions[key] = {"rows": len(part), "hash": digest}
+        written.append(key)
+    return keys, written
+
+
+def _append(csv_path, store_path, manifest, size):
+    delta = _read_complete(
+        csv_path, manifest["csv_offset"], size, names=manifest["columns"]
+    )
+    if delta.empty:
+        return {**manifest, **_csv_state(csv_path, size)}
+    delta = normalize_prices(delta)
+
+    paths = _paths(store_path)
+    partitions = manifest["partitions"]
+    _, written = _write_partitions(delta, store_path, partitions, merge_existing=True)
+
+    # Fold the new rows' aggregates into the persisted ones
+    for column in PRICE_BASES.values():
+        cube = merge_cubes(load_cube(store_path, column), build_cube(delta, column))
+        sketch = load_sketch(store_path, column).merge(
+            QuantileSketch.from_frame(delta, column)
+        )
+        write_parquet(cube, _basis_path(store_path, "cube", column))
+        write_parquet(sketch.table, _basis_path(store_path, "sketch", column))
+    markets = merge_market_tables(load_markets(store_path), build_market_table(delta))
+    write_parquet(markets, paths["markets"])
+
+    return {
+        **manifest,
+        **_csv_state(csv_path, size),
+        "version": time.time_ns(),
+        "rows": manifest["rows"] + len(delta),
+        "last_date": max(manifest["last_date"], delta[DATE_COLUMN].max().isoformat()),
+        "partitions": partitions,
+        "last_refresh": {"mode": "append", "rows": len(delta), "partitions": written},
+    }
+
+
+def _rebuild(csv_path, store_path, manifest, size):
+    df = _read_complete(csv_path, 0, size)
+    columns = df.columns.tolist()
+    df = normalize_prices(df)
+    paths = _paths(store_path)
+    os.makedirs(paths["partitions"], exist_ok=True)
+
+    partitions = dict(manifest["partitions"]) if manifest else {}
+    keys, written = _write_partitions(df, store_path, partitions, merge_existing=False)
+
+    # Drop months that disappeared from the export
+    for name in os.listdir(paths["partitions"]):
+        key = name.removesuffix(".parquet")
+        if name.endswith(".parquet") and key not in keys:
+            os.remove(partition_path(store_path, key))
+            partitions.pop(key, None)
+            written.append(key)
+
+    changed = bool(written) or manifest is None
+    if changed:
+        for column in PRICE_BASES.values():
+            write_parquet(
+                build_cube(df, column), _basis_path(store_path, "cube", column)
+            )
+            write_parquet(
+                QuantileSketch.from_frame(df, column).table,
+                _basis_path(store_path, "sketch", column),
+            )
+        write_parquet(build_market_table(df), paths["markets"])
+
+    return {
+        **_csv_state(csv_path, size),
+        "store_version": STORE_VERSION,
+        "version": time.time_ns() if changed else manifest["version"],
+        "columns": columns,
+        "rows": len(df),
+        "last_date": df[DATE_COLUMN].max().isoformat(),
+        "partitions": partitions,
+        "last_refresh": {"mode": "rebuild", "rows": len(df), "partitions": written},
+    }
+
+
+def ingest(csv_path=CSV_PATH, store_path=STORE_PATH):
+    with _lock:
+        manifest = read_manifest(store_path)
+        size = _complete_size(csv_path)
+        appended = (
+            manifest is not None
+            and size >= manifest["csv_offset"]
+            and _tail_hash(csv_path, manifest["csv_offset"]) == manifest["tail_hash"]
+        )
+        if appended and size == manifest["csv_offset"]:
+            manifest.update(_csv_state(csv_path, size))
+        elif appended:
+            manifest = _append(csv_path, store_path, manifest, size)
+        else:
+            manifest = _rebuild(csv_path, store_path, manifest, size)
+        write_manifest(manifest, store_path)
+        return manifest
+
+
+def refresh_store(csv_path=CSV_PATH, store_path=STORE_PATH):
+    # Cheap per-rerun check: only ingest when the CSV differs from what was ingested
+    manifest = read_manifest(store_path)
+    if os.path.exists(csv_path):
+        stat = os.stat(csv_path)
+        if (
+            manifest is None
+            or manifest["csv_size"] != stat.st_size
+            or manifest["csv_mtime"] != stat.st_mtime
+        ):
+            manifest = ingest(csv_path, store_path)
+    if manifest is None:
+        raise FileNotFoundError(csv_path)
+    return manifest["version"]
+
+
+def load_store(store_path=STORE_PATH):
+    # All month partitions, memory-mapped and concatenated in date order
+    table = pq.read_table(_paths(store_path)["partitions"], memory_map=True)
+    return restore_categoricals(table.unify_dictionaries().to_pandas())
+
+
+def load_cube(store_path=STORE_PATH, value_column="#value"):
+    return read_parquet(_basis_path(store_path, "cube", value_column))
+
+
+def load_sketch(store_path=STORE_PATH, value_column="#value"):
+    return QuantileSketch(read_parquet(_basis_path(store_path, "sketch", value_column)))
+
+
+def load_markets(store_path=STORE_PATH):
+    return read_parquet(_paths(store_path)["markets"])
+
+
+if __name__ == "__main__":
+    manifest = ingest()
+    refresh = manifest["last_refresh"]
+    print(
+        f"{refresh['mode']}: {refresh['rows']:,} rows, "
+        f"{len(refresh['partitions'])} partitions written, "
+        f"{manifest['rows']:,} rows in {STORE_PATH}"
+    )
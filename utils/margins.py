@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+from utils.cube import month_start, select
+
+# Retail and wholesale prices are only comparable for the same commodity, in
+# the same unit, in the same region and month
+MARGIN_KEYS = ["#adm1+name", "#item+name", "#item+unit"]
+RETAIL = "Retail"
+WHOLESALE = "Wholesale"
+
+# Markup quantiles drawn as each commodity's box
+BOX_QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+def align_price_types(df, value_column="#value"):
+    # One row per (region, commodity, unit, month) observed at both price types,
+    # with the mean retail and wholesale price and the retail/wholesale markup.
+    # The keys are combined from categorical codes into one integer, and the
+    # join is a sort (np.unique) over those integers, not a merge of labels
+    price_type = df["#item+price+type"]
+    retail = (price_type == RETAIL).to_numpy()
+    wholesale = (price_type == WHOLESALE).to_numpy()
+    values = df[value_column].to_numpy(dtype="float64")
+    months = month_start(df["#date"]).astype("datetime64[M]").astype(np.int64)
+
+    codes = [df[column].cat.codes.to_numpy().astype(np.int64) for column in MARGIN_KEYS]
+    keep = (retail | wholesale) & ~np.isnan(values)
+    for column_codes in codes:
+        keep &= column_codes >= 0
+
+    # Mixed-radix key: region, commodity, unit, then month
+    first_month, last_month = (
+        (months[keep].min(), months[keep].max()) if keep.any() else (0, 0)
+    )
+    radices = [len(df[column].cat.categories) for column in MARGIN_KEYS]
+    radices.append(int(last_month - first_month) + 1)
+    key = np.zeros(keep.sum(), dtype=np.int64)
+    for column_codes, radix in zip(codes + [months - first_month], radices):
+        key = key * radix + column_codes[keep]
+
+    groups, inverse = np.unique(key, return_inverse=True)
+    values, retail = values[keep], retail[keep]
+    size = len(groups)
+    retail_sum = np.bincount(inverse, np.where(retail, values, 0), size)
+    retail_count = np.bincount(inverse, retail, size)
+    wholesale_sum = np.bincount(inverse, np.where(retail, 0, values), size)
+    wholesale_count = np.bincount(inverse, ~retail, size)
+
+    both = (retail_count > 0) & (wholesale_count > 0)
+    groups = groups[both]
+    decoded = []
+    for radix in reversed(radices):
+        groups, remainder = np.divmod(groups, radix)
+        decoded.append(remainder)
+    decoded.reverse()
+
+    aligned = pd.DataFrame(
+        {
+            column: pd.Categorical.from_codes(
+                column_codes, categories=df[column].cat.categories
+            )
+            for column, column_codes in zip(MARGIN_KEYS, decoded)
+        }
+    )
+    aligned["month"] = (
+        (decoded[3] + first_month).astype("datetime64[M]").astype("datetime64[ns]")
+    )
+    aligned["retail_price"] = retail_sum[both] / retail_count[both]
+    aligned["wholesale_price"] = wholesale_sum[both] / wholesale_count[both]
+    aligned["retail_observations"] = retail_count[both].astype(int)
+    aligned["wholesale_observations"] = wholesale_count[both].astype(int)
+    aligned["markup"] = aligned["retail_price"] / aligned["wholesale_price"]
+    return aligned
+
+
+def aligned_prices(aligned, filters=None):
+    # Mean retail and wholesale price per commodity over the aligned pairs only,
+    # in the long format of the retail vs wholesale chart
+    means = (
+        select(aligned, filters)
+        .groupby("#item+name", observed=True)[["retail_price", "wholesale_price"]]
+        .mean()
+        .rename(columns={"retail_price": RETAIL, "wholesale_price": WHOLESALE})
+    )
+    return (
+        means.reset_index()
+        .melt(id_vars="#item+name", var_name="Price Type", value_name="Price (PHP)")
+        .rename(columns={"#item+name": "Commodity"})
+    )
+
+
+def markup_distribution(aligned, filters=None):
+    # Markup quantiles per commodity, so boxes are drawn from summaries rather
+    # than from every aligned pair
+    grouped = select(aligned, filters).groupby("#item+name", observed=True)["markup"]
+    quantiles = grouped.quantile(BOX_QUANTILES).unstack()
+    quantiles.columns = ["p5", "q1", "median", "q3", "p95"]
+    quantiles["pairs"] = grouped.size()
+    return (
+        quantiles.sort_values("median", ascending=False)
+        .rename_axis("Commodity")
+        .reset_index()
+    )
+
+
+def markup_trend(aligned, filters=None, window=12):
+    # Median markup of the selected pairs per month, with a rolling mean
+    monthly = (
+        select(aligned, filters).groupby("month")["markup"].agg(["median", "size"])
+    )
+    trend = monthly.rename(columns={"median": "Markup", "size": "Pairs"})
+    trend["Rolling Mean"] = trend["Markup"].rolling(window, min_periods=1).mean()
+    return trend.rename_axis("Date").reset_index()
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+from utils.cube import month_start, select
+
+# Per-market monthly aggregates behind the market map; like the cube, the table
+# merges group by group, so appended rows only need their own aggregates
+MARKET_DIMENSIONS = [
+    "#loc+market+name",
+    "#adm1+name",
+    "#item+name",
+    "#item+price+type",
+    "month",
+]
+
+# A market's coordinates are the same on every row, so any row's value will do
+MARKET_MEASURES = {"sum": "sum", "count": "sum", "lat": "max", "lon": "max"}
+
+# Cheapest to most expensive market in the current view
+LOW_PRICE_COLOR = np.array([26, 152, 80])
+HIGH_PRICE_COLOR = np.array([215, 48, 39])
+
+
+def build_market_table(df, value_column="#value"):
+    keys = [df[column] for column in MARKET_DIMENSIONS[:-1]]
+    keys.append(month_start(df["#date"]))
+    frame = pd.DataFrame(
+        {
+            "value": df[value_column].astype("float64"),
+            "lat": df["#geo+lat"],
+            "lon": df["#geo+lon"],
+        }
+    )
+    table = frame.groupby(keys, observed=True, sort=False).agg(
+        sum=("value", "sum"),
+        count=("value", "count"),
+        lat=("lat", "max"),
+        lon=("lon", "max"),
+    )
+    table.index.names = MARKET_DIMENSIONS
+    return table.reset_index()
+
+
+def merge_market_tables(*tables):
+    combined = pd.concat(tables, ignore_index=True)
+    for column in MARKET_DIMENSIONS[:-1]:
+        combined[column] = combined[column].astype("category")
+    merged = combined.groupby(MARKET_DIMENSIONS, observed=True, sort=False).agg(
+        MARKET_MEASURES
+    )
+    return merged.reset_index()
+
+
+def market_prices(table, filters=None, start=None, end=None):
+    # One row per located market: average price over the months in [start, end]
+    # and the average price in the latest of those months it reported
+    subset = select(table, filters)
+    if start is not None:
+        subset = subset[subset["month"] >= start]
+    if end is not None:
+        subset = subset[subset["month"] <= end]
+    subset = subset.dropna(subset=["lat", "lon"])
+
+    market = "#loc+market+name"
+    grouped = subset.groupby(market, observed=True)
+    markets = grouped.agg(
+        region=("#adm1+name", "first"),
+        lat=("lat", "max"),
+        lon=("lon", "max"),
+        total=("sum", "sum"),
+        observations=("count", "sum"),
+        latest_month=("month", "max"),
+    )
+    markets["average_price"] = markets["total"] / markets["observations"]
+
+    # Several price types of a commodity can share the latest month
+    latest = subset[
+        subset["month"].to_numpy()
+        == markets["latest_month"].reindex(subset[market]).to_numpy()
+    ]
+    latest = latest.groupby(market, observed=True)[["sum", "count"]].sum()
+    markets["latest_price"] = latest["sum"] / latest["count"]
+    return markets.drop(columns="total").reset_index(names="market")
+
+
+def grid_cells(markets, cell_degrees, price_column="average_price"):
+    # Roll markets up into square cells of cell_degrees, each cell's price
+    # weighted by the observations of its markets, for zoomed-out views
+    cells = pd.DataFrame(
+        {
+            "row": np.floor(markets["lat"] / cell_degrees).astype(int),
+            "col": np.floor(markets["lon"] / cell_degrees).astype(int),
+            "weighted": markets[price_column] * markets["observations"],
+            "observations": markets["observations"],
+        }
+    )
+    grouped = cells.groupby(["row", "col"]).agg(
+        weighted=("weighted", "sum"),
+        observations=("observations", "sum"),
+        markets=("weighted", "size"),
+    )
+    grouped[price_column] = grouped["weighted"] / grouped["observations"]
+    grouped = grouped.drop(columns="weighted").reset_index()
+
+    south = grouped["row"].to_numpy() * cell_degrees
+    west = grouped["col"].to_numpy() * cell_degrees
+    grouped["polygon"] = [
+        [
+            [w, s],
+            [w + cell_degrees, s],
+            [w + cell_degrees, s + cell_degrees],
+            [w, s + cell_degrees],
+        ]
+        for s, w in zip(south.tolist(), west.tolist())
+    ]
+    return grouped.drop(columns=["row", "col"])
+
+
+def price_colors(prices):
+    # Linear green-to-red RGB per price between the view's minimum and maximum
+    prices = np.asarray(prices, dtype="float64")
+    low, high = np.nanmin(prices), np.nanmax(prices)
+    scale = (prices - low) / (high - low) if high > low else np.zeros_like(prices)
+    colors = LOW_PRICE_COLOR + np.outer(scale, HIGH_PRICE_COLOR - LOW_PRICE_COLOR)
+    return colors.round().astype(int).tolist()
@@ -0,0 +1,60 @@
+import threading
+
+from cachetools import TTLCache
+
+from utils.metrics import CACHE_REQUESTS
+
+# Derived results kept across reruns and sessions; the least recently used are
+# evicted beyond MAX_ENTRIES and anything older than TTL_SECONDS is recomputed
+MAX_ENTRIES = 512
+TTL_SECONDS = 60 * 60
+
+_MISSING = object()
+
+
+def canonical_filters(filters):
+    # Equivalent sidebar states share a key: selection order, duplicates and
+    # "ALL" (or a restriction to nothing but "ALL") do not matter
+    canonical = []
+    for column, values in sorted((filters or {}).items()):
+        if values is None or "ALL" in values:
+            canonical.append((column, None))
+        else:
+            canonical.append((column, tuple(sorted(set(values)))))
+    return tuple(canonical)
+
+
+class DerivedCache:
+    """LRU/TTL cache of chart data and figures derived from one dataset version.
+
+    Entries are keyed on the result name, the canonical filters and any other
+    parameters. Results are shared between sessions, so callers must treat them
+    as read-only. A new dataset version drops every entry.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.entries = TTLCache(max_entries, ttl)
+        self.version = None
+        self.lock = threading.Lock()
+
+    def get(self, name, version, filters, params, compute):
+        key = (name, canonical_filters(filters), params)
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+            result = self.entries.get(key, _MISSING)
+        if result is not _MISSING:
+            CACHE_REQUESTS.labels(f"derived:{name}", "hit").inc()
+            return result
+
+        # Computed outside the lock; concurrent misses may both compute
+        CACHE_REQUESTS.labels(f"derived:{name}", "miss").inc()
+        result = compute()
+        with self.lock:
+            if version == self.version:
+                self.entries[key] = result
+        return result
+
+    def __len__(self):
+        return len(self.entries)
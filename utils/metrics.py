@@ -0,0 +1,191 @@
+"""Per-rerun timings, payload sizes and cache hit rates.
+
+Measurements go to Prometheus histograms and counters, served on a local
+endpoint (``DASHBOARD_METRICS_PORT``, default 9464), and to an optional
+developer panel in the sidebar (``?dev=1`` or ``DASHBOARD_DEV_PANEL=1``).
+"""
+
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import pyarrow as pa
+import streamlit as st
+from prometheus_client import Counter, Histogram, start_http_server
+
+from utils.startup import start_cache_warmer
+
+METRICS_PORT = int(os.environ.get("DASHBOARD_METRICS_PORT", "9464"))
+
+STAGE_SECONDS = Histogram(
+    "dashboard_stage_seconds",
+    "Time spent in each stage of a page rerun",
+    ["page", "stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+PAYLOAD_BYTES = Histogram(
+    "dashboard_payload_bytes",
+    "Serialized size of charts and tables sent to the browser",
+    ["page", "element"],
+    buckets=(1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7),
+)
+CACHE_REQUESTS = Counter(
+    "dashboard_cache_requests_total",
+    "Lookups of the process-wide data caches",
+    ["cache", "result"],
+)
+
+# Names of caches whose cached function body ran during the current lookup
+_misses = threading.local()
+
+
+def record_cache_miss(cache):
+    # Called from inside a cached function body, which only runs on a miss
+    if not hasattr(_misses, "names"):
+        _misses.names = set()
+    _misses.names.add(cache)
+
+
+def cached_call(cache, func, *args):
+    if not hasattr(_misses, "names"):
+        _misses.names = set()
+    _misses.names.discard(cache)
+    result = func(*args)
+    missed = cache in _misses.names
+    _misses.names.discard(cache)
+    CACHE_REQUESTS.labels(cache, "miss" if missed else "hit").inc()
+    return result
+
+
+# Serialized sizes of figures served from the derived-result cache, by id, so a
+# cached figure is not serialized an extra time on every rerun to measure it
+_figure_sizes = {}
+
+
+def figure_size(fig):
+    key = id(fig)
+    if key not in _figure_sizes:
+        _figure_sizes[key] = len(fig.to_json())
+        weakref.finalize(fig, _figure_sizes.pop, key, None)
+    return _figure_sizes[key]
+
+
+def cache_hit_rates():
+    rates = {}
+    for metric in CACHE_REQUESTS.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_total"):
+                counts = rates.setdefault(sample.labels["cache"], {"hit": 0, "miss": 0})
+                counts[sample.labels["result"]] += int(sample.value)
+    return rates
+
+
+@st.cache_resource
+def start_metrics_server():
+    # One endpoint per process; another worker may already hold the port
+    try:
+        start_http_server(METRICS_PORT, addr="127.0.0.1")
+        return METRICS_PORT
+    except OSError:
+        return None
+
+
+def dev_panel_enabled():
+    return (
+        st.query_params.get("dev") == "1"
+        or os.environ.get("DASHBOARD_DEV_PANEL") == "1"
+    )
+
+
+class RerunTimer:
+    """Collects the stage timings and payload sizes of one page rerun."""
+
+    def __init__(self, page):
+        self.page = page
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.payloads = []
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            STAGE_SECONDS.labels(self.page, name).observe(seconds)
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def _payload(self, element, size):
+        PAYLOAD_BYTES.labels(self.page, element).observe(size)
+        self.payloads.append((element, size))
+
+    def plotly_chart(self, fig, **kwargs):
+        with self.stage("render"):
+            self._payload("plotly_chart", figure_size(fig))
+            st.plotly_chart(fig, **kwargs)
+
+    def pydeck_chart(self, deck, **kwargs):
+        with self.stage("render"):
+            self._payload("pydeck_chart", len(deck.to_json()))
+            st.pydeck_chart(deck, **kwargs)
+
+    def dataframe(self, data, **kwargs):
+        with self.stage("render"):
+            table = pa.Table.from_pandas(data, preserve_index=False)
+            self._payload("dataframe", table.nbytes)
+            st.dataframe(data, **kwargs)
+
+    def finish(self):
+        total = time.perf_counter() - self.started
+        STAGE_SECONDS.labels(self.page, "total").observe(total)
+        if dev_panel_enabled():
+            self.render_panel(total)
+
+    def render_panel(self, total):
+        panel = st.sidebar.expander("Developer: rerun profile", expanded=True)
+        panel.caption(f"{self.page}: {total * 1000:,.1f} ms total")
+        panel.table(
+            {
+                "Stage": list(self.stages),
+                "ms": [f"{seconds * 1000:,.1f}" for seconds in self.stages.values()],
+            }
+        )
+        if self.payloads:
+            payload_bytes = sum(size for _, size in self.payloads)
+            panel.caption(
+                f"{len(self.payloads)} elements, {payload_bytes / 1024:,.1f} KiB sent"
+            )
+        rates = cache_hit_rates()
+        if rates:
+            panel.table(
+                {
+                    "Cache": list(rates),
+                    "Hits": [counts["hit"] for counts in rates.values()],
+                    "Misses": [counts["miss"] for counts in rates.values()],
+                }
+            )
+        render_startup_report(panel)
+        port = start_metrics_server()
+        if port:
+            panel.caption(f"Prometheus metrics on http://127.0.0.1:{port}/metrics")
+
+
+def render_startup_report(panel):
+    # What the process's background warm-up loaded, how long each step took,
+    # and which steps failed (their tracebacks are in the server log)
+    warmer = start_cache_warmer()
+    timings, failures = dict(warmer.timings), dict(warmer.failures)
+    status = "running" if warmer.is_alive() else "finished"
+    panel.caption(f"Start-up warm-up {status}, {sum(timings.values()):,.2f} s")
+    if timings:
+        panel.table(
+            {
+                "Warm-up step": list(timings),
+                "ms": [f"{seconds * 1000:,.1f}" for seconds in timings.values()],
+            }
+        )
+    for name, error in failures.items():
+        panel.error(f"Warm-up step {name!r} failed: {error}")
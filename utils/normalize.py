@@ -0,0 +1,107 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from utils.data import DATE_COLUMN
+
+# Standard unit and quantity of one reported unit word; a leading number in the
+# reported unit ("500 G", "100 Tubers") multiplies the quantity. Units not
+# listed here are kept as their own standard unit
+UNIT_QUANTITIES = {
+    "kg": ("KG", 1.0),
+    "g": ("KG", 0.001),
+    "mt": ("KG", 1000.0),
+    "l": ("L", 1.0),
+    "ml": ("L", 0.001),
+    "piece": ("Piece", 1.0),
+    "pieces": ("Piece", 1.0),
+    "dozen": ("Piece", 12.0),
+    "tuber": ("Tuber", 1.0),
+    "tubers": ("Tuber", 1.0),
+    "bunch": ("Bunch", 1.0),
+    "head": ("Head", 1.0),
+    "pack": ("Pack", 1.0),
+    "unit": ("Unit", 1.0),
+}
+
+UNIT_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)?\s*(.*?)\s*$")
+
+# Approximate annual averages of the PSA headline CPI for the Philippines
+# (2018 = 100), back-cast before 2018 from the published annual inflation rates.
+# Years outside the table use its nearest year
+CPI_BASE_YEAR = 2018
+CPI = {
+    2000: 49.6,
+    2001: 52.6,
+    2002: 54.0,
+    2003: 55.6,
+    2004: 58.3,
+    2005: 62.1,
+    2006: 65.5,
+    2007: 67.4,
+    2008: 73.0,
+    2009: 76.1,
+    2010: 79.0,
+    2011: 82.6,
+    2012: 85.3,
+    2013: 87.5,
+    2014: 90.6,
+    2015: 91.2,
+    2016: 92.4,
+    2017: 95.1,
+    2018: 100.0,
+    2019: 102.4,
+    2020: 105.1,
+    2021: 109.3,
+    2022: 115.6,
+    2023: 122.4,
+    2024: 126.4,
+}
+
+# Price columns the toggle can chart; each has its own persisted cube and sketch
+PRICE_BASES = {
+    "As reported": "#value",
+    "Per standard unit": "#value+std",
+    f"Per standard unit, {CPI_BASE_YEAR} pesos": "#value+std+real",
+}
+
+
+def parse_unit(unit):
+    # (standard unit, quantity of it in one reported unit)
+    count, word = UNIT_PATTERN.match(str(unit)).groups()
+    standard, quantity = UNIT_QUANTITIES.get(word.lower(), (word or str(unit), 1.0))
+    return standard, quantity * (float(count) if count else 1.0)
+
+
+def cpi_index(dates):
+    # CPI of each date's year relative to the base year
+    years = np.asarray(sorted(CPI))
+    values = np.asarray([CPI[year] for year in years]) / CPI[CPI_BASE_YEAR]
+    positions = dates.dt.year.to_numpy() - years[0]
+    return values[np.clip(positions, 0, len(years) - 1)]
+
+
+def normalize_prices(df):
+    # Adds the standard unit and float32 prices per standard unit in PHP and
+    # USD, plus PHP per standard unit at base-year prices. Units are parsed once
+    # per category, then mapped onto the rows through the categorical codes
+    parsed = [parse_unit(unit) for unit in df["#item+unit"].cat.categories]
+    standard_units = pd.Index([standard for standard, _ in parsed])
+    categories = standard_units.unique()
+    codes = df["#item+unit"].cat.codes.to_numpy()
+
+    # A missing unit (code -1) picks the appended -1 code and NaN quantity
+    standard_codes = np.append(categories.get_indexer(standard_units), -1)[codes]
+    quantities = np.append([quantity for _, quantity in parsed], np.nan)[codes]
+    df["#item+unit+std"] = pd.Categorical.from_codes(
+        standard_codes, categories=categories
+    )
+    standard = df["#value"].to_numpy(dtype="float64") / quantities
+    df["#value+std"] = standard.astype("float32")
+    if "#value+usd" in df.columns:
+        usd = df["#value+usd"].to_numpy(dtype="float64") / quantities
+        df["#value+usd+std"] = usd.astype("float32")
+    real = standard / cpi_index(df[DATE_COLUMN])
+    df["#value+std+real"] = real.astype("float32")
+    return df
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+from utils.cube import rollup, select
+
+# Every bucket value is within this relative distance of the prices counted in
+# it, and so every interpolated quantile of non-negative prices is within it of
+# the exact (np.percentile) value
+RELATIVE_ACCURACY = 0.01
+
+# Groups whose bucket counts are kept apart so that any filter can merge them
+SKETCH_DIMENSIONS = ["#adm1+name", "#item+name", "#item+price+type", "#item+type"]
+
+# Bucket reserved for zero (and any non-positive) prices
+ZERO_BUCKET = np.iinfo(np.int32).min
+
+
+def interpolate(cumulative, ranks, values):
+    # np.percentile's linear rule on the bucket values: the values at the ranks
+    # either side of each fractional rank, weighted by its fraction. Each is
+    # within the relative accuracy of the exact value at its rank, so their
+    # weighted sum is within it of the exact percentile
+    lower, upper = np.floor(ranks), np.ceil(ranks)
+    below = values[np.searchsorted(cumulative, lower, side="right")]
+    above = values[np.searchsorted(cumulative, upper, side="right")]
+    return below + (ranks - lower) * (above - below)
+
+
+class QuantileSketch:
+    """Log-bucketed quantile sketch (DDSketch) kept per filter group.
+
+    Prices are counted into buckets whose bounds grow geometrically, so a
+    bucket's midpoint is within ``relative_accuracy`` of every value in it.
+    Sketches merge by adding bucket counts, which lets any region/commodity
+    selection be answered from the per-group table in one pass.
+    """
+
+    def __init__(self, table, relative_accuracy=RELATIVE_ACCURACY):
+        # table holds one bucket count per group and bucket
+        self.table = table
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+
+    @classmethod
+    def from_frame(cls, df, value_column="#value", relative_accuracy=RELATIVE_ACCURACY):
+        sketch = cls(None, relative_accuracy)
+        values = df[value_column].to_numpy(dtype="float64")
+        present = ~np.isnan(values)
+        frame = pd.DataFrame(
+            {column: df[column].array[present] for column in SKETCH_DIMENSIONS}
+        )
+        frame["bucket"] = sketch.bucket(values[present])
+        sketch.table = (
+            frame.groupby(list(frame.columns), observed=True)
+            .size()
+            .rename("count")
+            .reset_index()
+        )
+        return sketch
+
+    def merge(self, other):
+        # Sketches of disjoint row sets merge by adding bucket counts
+        combined = pd.concat([self.table, other.table], ignore_index=True)
+        for column in SKETCH_DIMENSIONS:
+            combined[column] = combined[column].astype("category")
+        table = (
+            combined.groupby(SKETCH_DIMENSIONS + ["bucket"], observed=True)["count"]
+            .sum()
+            .reset_index()
+        )
+        return QuantileSketch(table, self.relative_accuracy)
+
+    def bucket(self, values):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            buckets = np.ceil(np.log(values) / np.log(self.gamma))
+        return np.where(values > 0, buckets, ZERO_BUCKET).astype(np.int32)
+
+    def bucket_value(self, buckets):
+        values = 2 * self.gamma ** buckets.astype("float64") / (self.gamma + 1)
+        return np.where(buckets == ZERO_BUCKET, 0.0, values)
+
+    def quantiles(self, q, filters=None):
+        # q is given in percent, as for np.percentile
+        counts = select(self.table, filters).groupby("bucket")["count"].sum()
+        q = np.asarray(q, dtype="float64")
+        if counts.empty:
+            return np.full(q.shape, np.nan)
+        cumulative = counts.to_numpy().cumsum()
+        ranks = q / 100 * (cumulative[-1] - 1)
+        values = self.bucket_value(counts.index.to_numpy())
+        return interpolate(cumulative, ranks, values)
+
+    def grouped_quantiles(self, q, by, filters=None):
+        # One column per q and one row per group of the by columns. Counts are
+        # sorted by group, then bucket, so each group's ranks are searched in
+        # its own stretch of the running total
+        if not by:
+            return pd.DataFrame([self.quantiles(q, filters)], columns=q)
+        counts = (
+            select(self.table, filters)
+            .groupby(by + ["bucket"], observed=True)["count"]
+            .sum()
+        )
+        if counts.empty:
+            return pd.DataFrame(columns=by + list(q))
+        groups = counts.index.droplevel("bucket")
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        cumulative = counts.to_numpy().cumsum()
+        ends = np.r_[starts[1:], len(counts)]
+        before = np.r_[0, cumulative[ends[:-1] - 1]]
+        totals = cumulative[ends - 1] - before
+        values = self.bucket_value(counts.index.get_level_values("bucket").to_numpy())
+
+        # before is whole, so the ranks either side stay in the group's stretch
+        result = groups[starts].to_frame(index=False)
+        for value in q:
+            ranks = before + value / 100 * (totals - 1)
+            result[value] = interpolate(cumulative, ranks, values)
+        return result
+
+
+def describe(cube, sketch, filters=None, name="Price (PHP)"):
+    # Same summary as Series.describe(), from the cube totals and the sketch
+    totals = rollup(cube, [], filters).iloc[0]
+    count, mean = totals["count"], totals["mean"]
+    if count > 1:
+        variance = max(totals["sumsq"] - count * mean**2, 0) / (count - 1)
+    else:
+        variance = np.nan
+    q25, q50, q75 = sketch.quantiles([25, 50, 75], filters)
+    return pd.Series(
+        {
+            "count": count,
+            "mean": mean,
+            "std": np.sqrt(variance),
+            "min": totals["min"],
+            "25%": max(q25, totals["min"]),
+            "50%": q50,
+            "75%": min(q75, totals["max"]),
+            "max": totals["max"],
+        },
+        name=name,
+    )
+
+
+def describe_exact(values, name="Price (PHP)"):
+    return values.astype("float64").describe().rename(name)
@@ -0,0 +1,396 @@
+"""Static report bundles of the dashboard for a matrix of filter presets.
+
+Every region preset in the preset file is combined with every commodity
+preset, and each combination is rendered to its own directory as a standalone
+index.html and a report.json holding the figures and summary tables of the
+Food Prices Visualization and Descriptive Statistics pages, computed by the
+same functions. Presets are rendered in parallel across a process pool, and a
+preset is only re-rendered when the rows it selects, or its forecasts, changed
+since its bundle was written.
+
+    python -m utils.report --workers 4
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import logging
+import os
+import re
+import time
+import tomllib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+from utils.charts import (
+    RANKING_VIEWS,
+    average_price,
+    category_distribution,
+    category_figure,
+    commodity_price_figure,
+    commodity_ranking,
+    frequency_distribution,
+    latest_changes,
+    markup_box_figure,
+    markup_trend_figure,
+    median_price,
+    price_type_figure,
+    ranking_figure,
+    region_commodity_figure,
+    regional_price_figure,
+    trend_figure,
+    volatility_figure,
+    yoy_figure,
+)
+from utils.cube import select
+from utils.data import DISPLAY_NAMES
+from utils.distribution import box_figure, box_statistics
+from utils.filters import FilterIndex
+from utils.forecast import load_forecasts, selection_forecast
+from utils.ingest import (
+    STORE_PATH,
+    load_cube,
+    load_markets,
+    load_sketch,
+    load_store,
+    refresh_store,
+)
+from utils.margins import (
+    align_price_types,
+    aligned_prices,
+    markup_distribution,
+    markup_trend,
+)
+from utils.quantiles import describe
+from utils.timeseries import PriceSeries
+from utils.volatility import RANKING_MEASURES, Volatility
+
+logger = logging.getLogger(__name__)
+
+PRESETS_PATH = "reports/presets.toml"
+OUTPUT_PATH = "reports/build"
+MANIFEST_FILE = "manifest.json"
+PLOTLY_FILE = "plotly.min.js"
+
+# Bump when the bundle contents change so every preset is re-rendered
+REPORT_VERSION = 2
+
+# Categorical columns summarised as frequency tables, by display name
+FREQUENCY_COLUMNS = ["Region", "Commodity", "Commodity Type", "Price Type"]
+
+# Data of the process rendering presets, loaded once by _init_worker
+_data = None
+
+
+class ReportData:
+    """The shared dataset and derived tables behind the dashboard pages."""
+
+    def __init__(self, store_path=STORE_PATH):
+        df = load_store(store_path)
+        self.display = df.rename(columns=DISPLAY_NAMES)
+        self.index = FilterIndex(df)
+        self.cube = load_cube(store_path)
+        self.sketch = load_sketch(store_path)
+        self.series = PriceSeries(self.cube)
+        self.volatility = Volatility(load_markets(store_path))
+        self.margins = align_price_types(df)
+        self.forecasts = load_forecasts(store_path)
+
+
+def load_presets(path=PRESETS_PATH):
+    # Region x commodity presets; an empty list means no restriction
+    with open(path, "rb") as f:
+        config = tomllib.load(f)
+    presets = []
+    for region_name, regions in config["regions"].items():
+        for commodity_name, commodities in config["commodities"].items():
+            name = f"{region_name} - {commodity_name}"
+            presets.append(
+                {
+                    "name": name,
+                    "slug": re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-"),
+                    "filters": {
+                        "#adm1+name": regions or None,
+                        "#item+name": commodities or None,
+                    },
+                }
+            )
+    return presets
+
+
+def preset_digest(row_hashes, positions, forecasts, filters):
+    # Order-independent digest of the preset's rows and forecasts; unrelated
+    # partitions can change without touching it
+    selected = row_hashes if positions is None else row_hashes[positions]
+    digest = hashlib.sha1(
+        json.dumps([REPORT_VERSION, filters], sort_keys=True).encode()
+    )
+    digest.update(np.add.reduce(selected, dtype=np.uint64).tobytes())
+    digest.update(np.int64(len(selected)).tobytes())
+    if forecasts is not None:
+        forecast_rows = select(forecasts, filters)
+        digest.update(pd.util.hash_pandas_object(forecast_rows, index=False).values)
+    return digest.hexdigest()
+
+
+def _selected(values, available):
+    # The selected values present in the data, all of them when unrestricted
+    if values is None:
+        return list(available)
+    return [value for value in values if value in available]
+
+
+def build_report(data, filters):
+    # Metrics, tables and figures of both pages for one filter state, or None
+    # when the preset selects no rows
+    for column, values in filters.items():
+        # A misspelt value would otherwise silently narrow the preset
+        unmatched = sorted(set(values or []) - set(data.cube[column].unique()))
+        if unmatched:
+            logger.warning(
+                "No rows match %s %s", DISPLAY_NAMES[column], ", ".join(unmatched)
+            )
+    rows = data.index.apply(data.display, filters)
+    if rows.empty:
+        return None
+    regions = _selected(filters["#adm1+name"], data.cube["#adm1+name"].unique())
+    commodities = _selected(filters["#item+name"], data.cube["#item+name"].unique())
+    tables, figures = {}, {}
+
+    summary = describe(data.cube, data.sketch, filters)
+    average = average_price(data.cube, [], filters)["Price (PHP)"].iloc[0]
+    metrics = {
+        "Average Price (PHP)": average,
+        "Median Price (PHP)": median_price(data.sketch, filters),
+        "Observations": int(summary["count"]),
+    }
+    tables["Price Summary"] = summary.rename_axis("Statistic").reset_index()
+
+    categories = category_distribution(data.cube, filters)
+    tables["Food Categories"] = categories
+    figures["category"] = category_figure(categories)
+
+    # Same breakdown as the page picks for the number of regions and commodities
+    if len(regions) > 1 and len(commodities) > 1:
+        breakdown = average_price(data.cube, ["#adm1+name", "#item+name"], filters)
+        figures["region_commodity"] = region_commodity_figure(breakdown)
+    elif len(regions) > 1:
+        breakdown = average_price(data.cube, ["#adm1+name"], filters)
+        figures["regional_prices"] = regional_price_figure(breakdown, commodities[0])
+    elif len(commodities) > 1:
+        breakdown = average_price(data.cube, ["#item+name"], filters)
+        figures["commodity_prices"] = commodity_price_figure(breakdown, regions[0])
+
+    retail_vs_wholesale = aligned_prices(data.margins, filters)
+    if not retail_vs_wholesale.empty:
+        figures["retail_vs_wholesale"] = price_type_figure(retail_vs_wholesale)
+        markups = markup_distribution(data.margins, filters)
+        tables["Retail Markup"] = markups
+        figures["markup_distribution"] = markup_box_figure(markups)
+        figures["markup_trend"] = markup_trend_figure(
+            markup_trend(data.margins, filters)
+        )
+
+    for view in RANKING_VIEWS:
+        ranking = commodity_ranking(data.cube, filters, view)
+        figures[view.lower().replace(" ", "_")] = ranking_figure(ranking, view)
+
+    forecast = selection_forecast(data.forecasts, data.series, filters)
+    for granularity in ["Monthly", "Yearly"]:
+        trend = data.series.trend(filters, granularity)
+        figures[f"trend_{granularity.lower()}"] = trend_figure(
+            trend,
+            granularity,
+            forecast if granularity == "Monthly" else None,
+            data.volatility.spike_counts(filters, granularity),
+        )
+        figures[f"yoy_{granularity.lower()}"] = yoy_figure(trend, granularity)
+    tables["Latest Year-over-Year Change"] = latest_changes(data.series, filters)
+
+    for measure, column in RANKING_MEASURES.items():
+        ranked = data.volatility.commodity_volatility(filters, column)
+        if not ranked.empty:
+            figures[f"volatility_{column}"] = volatility_figure(ranked, measure)
+    tables["Most Volatile Market Series"] = data.volatility.most_volatile(
+        filters, n=25
+    ).rename(columns=DISPLAY_NAMES)
+
+    box_stats = box_statistics(
+        rows["Price (PHP)"].to_numpy(dtype="float64"),
+        [summary["25%"], summary["50%"], summary["75%"]],
+    )
+    figures["price_distribution"] = box_figure(
+        box_stats, "Price (PHP)", "Distribution of Prices in PHP"
+    )
+    for column in FREQUENCY_COLUMNS:
+        tables[f"{column} Frequency"] = frequency_distribution(rows, column)
+    return {"metrics": metrics, "tables": tables, "figures": figures}
+
+
+def _records(table):
+    return json.loads(table.to_json(orient="records", date_format="iso"))
+
+
+def _html_page(preset, report, generated):
+    metrics = "".join(
+        f"<li><b>{html.escape(name)}</b>: {value:,.2f}</li>"
+        for name, value in report["metrics"].items()
+    )
+    figures = "".join(
+        pio.to_html(fig, full_html=False, include_plotlyjs=False)
+        for fig in report["figures"].values()
+    )
+    tables = "".join(
+        f"<h3>{html.escape(name)}</h3>"
+        + table.to_html(index=False, float_format="{:,.2f}".format, border=0)
+        for name, table in report["tables"].items()
+    )
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>{html.escape(preset['name'])}</title>"
+        f"<script src='../{PLOTLY_FILE}'></script></head><body>"
+        f"<h1>Philippine Food Prices: {html.escape(preset['name'])}</h1>"
+        f"<p>Generated {generated}</p><ul>{metrics}</ul>"
+        f"<h2>Charts</h2>{figures}<h2>Tables</h2>{tables}</body></html>"
+    )
+
+
+def write_bundle(output, preset, report, digest):
+    directory = os.path.join(output, preset["slug"])
+    os.makedirs(directory, exist_ok=True)
+    generated = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    bundle = {
+        "name": preset["name"],
+        "filters": preset["filters"],
+        "digest": digest,
+        "generated": generated,
+        "metrics": {name: float(value) for name, value in report["metrics"].items()},
+        "tables": {name: _records(table) for name, table in report["tables"].items()},
+        "figures": {
+            name: json.loads(fig.to_json()) for name, fig in report["figures"].items()
+        },
+    }
+    # Written under temporary names first, like the store's Parquet files
+    for name, content in [
+        ("report.json", json.dumps(bundle)),
+        ("index.html", _html_page(preset, report, generated)),
+    ]:
+        path = os.path.join(directory, name)
+        with open(f"{path}.tmp", "w") as f:
+            f.write(content)
+        os.replace(f"{path}.tmp", path)
+
+
+def _init_worker(store_path):
+    global _data
+    _data = ReportData(store_path)
+
+
+def _render(preset, digest, output):
+    # Returns the preset's manifest entry; empty selections write no bundle
+    report = build_report(_data, preset["filters"])
+    if report is not None:
+        write_bundle(output, preset, report, digest)
+    return preset["slug"], {"digest": digest, "empty": report is None}
+
+
+def _write_index(output, presets, manifest):
+    links = "".join(
+        f"<li><a href='{preset['slug']}/index.html'>{html.escape(preset['name'])}</a></li>"
+        for preset in presets
+        if not manifest[preset["slug"]]["empty"]
+    )
+    path = os.path.join(output, "index.html")
+    with open(path, "w") as f:
+        f.write(
+            "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+            "<title>Philippine Food Prices Reports</title></head><body>"
+            f"<h1>Philippine Food Prices Reports</h1><ul>{links}</ul></body></html>"
+        )
+    with open(os.path.join(output, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def run(
+    presets_path=PRESETS_PATH, output=OUTPUT_PATH, workers=None, store_path=STORE_PATH
+):
+    presets = load_presets(presets_path)
+    os.makedirs(output, exist_ok=True)
+    plotly_path = os.path.join(output, PLOTLY_FILE)
+    if not os.path.exists(plotly_path):
+        with open(plotly_path, "w") as f:
+            f.write(get_plotlyjs())
+
+    # Digests come from the row hashes alone; the pages' data is only loaded
+    # by the processes that render
+    df = load_store(store_path)
+    index = FilterIndex(df)
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    forecasts = load_forecasts(store_path)
+    digests = {
+        preset["slug"]: preset_digest(
+            row_hashes, index.lookup(preset["filters"]), forecasts, preset["filters"]
+        )
+        for preset in presets
+    }
+    del df, index, row_hashes
+
+    manifest_path = os.path.join(output, MANIFEST_FILE)
+    previous = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            previous = json.load(f)
+    manifest = {
+        slug: entry
+        for slug, entry in previous.items()
+        if entry["digest"] == digests.get(slug)
+        and (
+            entry["empty"] or os.path.exists(os.path.join(output, slug, "report.json"))
+        )
+    }
+    stale = [preset for preset in presets if preset["slug"] not in manifest]
+
+    start = time.perf_counter()
+    arguments = (stale, [digests[p["slug"]] for p in stale], [output] * len(stale))
+    if workers == 1 or len(stale) <= 1:
+        if stale:
+            _init_worker(store_path)
+        results = list(map(_render, *arguments))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(store_path,)
+        ) as pool:
+            results = list(pool.map(_render, *arguments))
+    manifest.update(dict(results))
+    _write_index(output, presets, manifest)
+    return {
+        "presets": len(presets),
+        "rendered": sum(not entry["empty"] for _, entry in results),
+        "empty": [slug for slug, entry in results if entry["empty"]],
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--presets", default=PRESETS_PATH)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    refresh_store()
+    result = run(args.presets, args.output, args.workers)
+    print(
+        f"{result['rendered']:,} of {result['presets']:,} presets rendered in "
+        f"{result['seconds']:.2f}s to {args.output}"
+        + (f"; no rows for {', '.join(result['empty'])}" if result["empty"] else "")
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Process start-up: render the landing page first, load everything else after.
+
+Only Streamlit and this module are imported before the first page renders.
+The shared data caches, chart libraries, metrics endpoint and query API are
+loaded by a background thread that starts with the first session, so the Introduction
+paints while the dataset is read and the first chart page finds it cached.
+Set ``DASHBOARD_STARTUP=eager`` to wait for the warm-up before rendering,
+e.g. behind a load balancer that should only route to fully loaded replicas.
+"""
+
+import importlib
+import logging
+import os
+import threading
+import time
+
+import streamlit as st
+
+STARTUP_MODE = os.environ.get("DASHBOARD_STARTUP", "lazy")
+
+logger = logging.getLogger(__name__)
+
+# Imported by the warm-up thread, so the first chart page does not pay for them
+WARM_IMPORTS = [
+    "pandas",
+    "plotly.express",
+    "pydeck",
+    "streamlit_extras.metric_cards",
+    "utils.charts",
+]
+
+# Process-wide caches loaded after the dataset, by their utils.cache getter
+WARM_CACHES = [
+    "cube",
+    "sketch",
+    "filter_index",
+    "price_series",
+    "markets",
+    "volatility",
+    "margins",
+    "cohorts",
+]
+
+
+class CacheWarmer(threading.Thread):
+    """Loads the process-wide caches in the background, once per process.
+
+    Step timings and failures are kept for the developer panel's start-up
+    report. A failed step is logged; pages load whatever it would have
+    loaded themselves and surface the error there.
+    """
+
+    def __init__(self):
+        super().__init__(name="dashboard-cache-warmer", daemon=True)
+        self.timings = {}
+        self.failures = {}
+
+    def _timed(self, name, func, *args):
+        # True when the step succeeded
+        start = time.perf_counter()
+        try:
+            func(*args)
+        except Exception as error:
+            logger.exception("Start-up warm-up step %r failed", name)
+            self.failures[name] = error
+            return False
+        self.timings[name] = time.perf_counter() - start
+        return True
+
+    def run(self):
+        if not self._timed(
+            "import utils.cache", importlib.import_module, "utils.cache"
+        ):
+            return
+        cache = importlib.import_module("utils.cache")
+        # The endpoints are independent of the data, and of each other
+        self._timed(
+            "metrics server",
+            lambda: importlib.import_module("utils.metrics").start_metrics_server(),
+        )
+        self._timed(
+            "query API", lambda: importlib.import_module("utils.api").start_api_server()
+        )
+        # The dataset first, as the Introduction's sample waits for it
+        loaded = self._timed("dataset", cache.get_dataset)
+        for module in WARM_IMPORTS:
+            self._timed(f"import {module}", importlib.import_module, module)
+        # Every cache is built from the dataset, so none can load without it
+        if loaded:
+            for name in WARM_CACHES:
+                self._timed(name, getattr(cache, f"get_{name}"))
+
+
+@st.cache_resource(show_spinner=False)
+def start_cache_warmer():
+    warmer = CacheWarmer()
+    warmer.start()
+    return warmer
+
+
+def warm_start():
+    warmer = start_cache_warmer()
+    if STARTUP_MODE == "eager":
+        warmer.join()
+    return warmer
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+from utils.cube import select
+
+# A price series is one commodity at one price type in one region
+SERIES_DIMENSIONS = ["#adm1+name", "#item+name", "#item+price+type"]
+
+# Period start frequency, rolling window and year-over-year lag per granularity
+GRANULARITIES = {
+    "Monthly": {"freq": "MS", "window": 12, "lag": 12},
+    "Quarterly": {"freq": "QS", "window": 4, "lag": 4},
+    "Yearly": {"freq": "YS", "window": 3, "lag": 1},
+}
+
+
+def _divide(sums, counts):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def _rolling_mean(values, window):
+    # Rolling mean along the period axis of a 1-D or periods x series array
+    return pd.DataFrame(values).rolling(window, min_periods=1).mean().to_numpy()
+
+
+def _change(values, lag):
+    previous = np.full_like(values, np.nan)
+    previous[lag:] = values[:-lag]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return values / previous - 1
+
+
+class PriceSeries:
+    """Monthly sums and counts of every region x commodity x price type series.
+
+    The cube is pivoted once into dense periods x series matrices, so a trend
+    for any selection is a column sum followed by a reduction over periods,
+    and per-series rolling means and year-over-year changes are computed for
+    all series at once.
+    """
+
+    def __init__(self, cube):
+        grouped = cube.groupby(SERIES_DIMENSIONS + ["month"], observed=True)[
+            ["sum", "count"]
+        ].sum()
+        series_ids, keys = grouped.index.droplevel("month").factorize()
+        self.series = keys.to_frame(index=False, name=SERIES_DIMENSIONS)
+
+        months = grouped.index.get_level_values("month")
+        self.months = pd.date_range(months.min(), months.max(), freq="MS")
+        month_ids = self.months.get_indexer(months)
+
+        shape = (len(self.months), len(self.series))
+        self.sums = np.zeros(shape)
+        self.counts = np.zeros(shape)
+        self.sums[month_ids, series_ids] = grouped["sum"].to_numpy()
+        self.counts[month_ids, series_ids] = grouped["count"].to_numpy()
+
+        # Per-series monthly statistics, vectorised across every series
+        self.means = _divide(self.sums, self.counts)
+        self.rolling_means = _rolling_mean(
+            self.means, GRANULARITIES["Monthly"]["window"]
+        )
+        self.yoy_changes = _change(self.means, GRANULARITIES["Monthly"]["lag"])
+
+    def selection(self, filters=None):
+        return select(self.series, filters).index.to_numpy()
+
+    def period_starts(self, granularity):
+        # Start date of each quarter or year, and the month index it begins at
+        periods = self.months.to_period(GRANULARITIES[granularity]["freq"][0])
+        periods = periods.start_time
+        starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+        return periods[starts], starts
+
+    def trend(self, filters=None, granularity="Yearly"):
+        settings = GRANULARITIES[granularity]
+        columns = self.selection(filters)
+        sums = self.sums[:, columns].sum(axis=1)
+        counts = self.counts[:, columns].sum(axis=1)
+
+        # Reduce consecutive months into their quarter or year
+        dates, starts = self.period_starts(granularity)
+        sums = np.add.reduceat(sums, starts) if len(starts) else sums
+        counts = np.add.reduceat(counts, starts) if len(starts) else counts
+
+        prices = _divide(sums, counts)
+        trend = pd.DataFrame(
+            {
+                "Date": dates,
+                "Price (PHP)": prices,
+                "Rolling Mean": _rolling_mean(prices, settings["window"])[:, 0],
+                "YoY Change": _change(prices, settings["lag"]),
+            }
+        )
+        return trend[counts > 0].reset_index(drop=True)
+
+    def grouped_trend(self, weights, granularity="Yearly"):
+        # Trends of every column of a series x groups weight matrix at once:
+        # period dates, and periods x groups counts, prices, rolling means and
+        # year-over-year changes
+        settings = GRANULARITIES[granularity]
+        dates, starts = self.period_starts(granularity)
+        sums = np.add.reduceat(self.sums @ weights, starts, axis=0)
+        counts = np.add.reduceat(self.counts @ weights, starts, axis=0)
+        prices = _divide(sums, counts)
+        return (
+            dates,
+            counts,
+            prices,
+            _rolling_mean(prices, settings["window"]),
+            _change(prices, settings["lag"]),
+        )
+
+    def latest_changes(self, filters=None):
+        # Latest observed month of each selected series with its YoY change
+        columns = self.selection(filters)
+        observed = self.counts[:, columns] > 0
+        last = len(self.months) - 1 - np.argmax(observed[::-1], axis=0)
+        table = self.series.iloc[columns].reset_index(drop=True)
+        table["Latest Month"] = self.months[last]
+        table["Latest Price"] = self.means[last, columns]
+        table["12-Month Average"] = self.rolling_means[last, columns]
+        table["YoY Change"] = self.yoy_changes[last, columns]
+        return table[observed.any(axis=0)]
@@ -0,0 +1,174 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from utils.cube import select
+from utils.timeseries import GRANULARITIES
+
+# A volatility series is one commodity at one price type in one market
+SERIES_DIMENSIONS = ["#loc+market+name", "#adm1+name", "#item+name", "#item+price+type"]
+
+# Rolling volatility is the std of the last 12 monthly returns (at least 6)
+VOLATILITY_WINDOW = 12
+MIN_PERIODS = 6
+
+# Modified z-score above which a return is flagged as a spike (Iglewicz and
+# Hoaglin); 1.4826 scales the MAD to the std of normally distributed returns
+SPIKE_THRESHOLD = 3.5
+MAD_SCALE = 1.4826
+
+# Series with fewer monthly returns are left out of the rankings
+MIN_RETURNS = 12
+
+RANKING_MEASURES = {
+    "Return Volatility": "volatility",
+    "Coefficient of Variation": "cv",
+}
+
+
+def _nan_quiet(func, *args, **kwargs):
+    # nanmedian and friends warn on all-missing series, which are expected here
+    with warnings.catch_warnings(), np.errstate(divide="ignore", invalid="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return func(*args, **kwargs)
+
+
+def log_returns(prices):
+    # Month-over-month log returns along the period axis; a gap in either month
+    # (or a non-positive price) leaves the return missing
+    prices = np.where(prices > 0, prices, np.nan)
+    returns = np.full_like(prices, np.nan)
+    returns[1:] = _nan_quiet(np.log, prices[1:] / prices[:-1])
+    return returns
+
+
+def rolling_std(values, window=VOLATILITY_WINDOW, min_periods=MIN_PERIODS):
+    # Rolling sample std along the period axis from cumulative sums, skipping
+    # missing values; pandas would loop over the series one column at a time
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    start = np.maximum(np.arange(1, len(values) + 1) - window, 0)
+
+    def window_sums(data):
+        total = np.concatenate([np.zeros_like(data[:1]), np.cumsum(data, axis=0)])
+        return total[1:] - total[start]
+
+    n = window_sums(valid.astype("float64"))
+    s = window_sums(filled)
+    q = window_sums(filled**2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = np.maximum(q - s**2 / n, 0) / (n - 1)
+    return np.where(n >= max(min_periods, 2), np.sqrt(variance), np.nan)
+
+
+def robust_z_scores(values):
+    # Modified z-scores along the period axis; series whose MAD is zero (mostly
+    # unchanged prices) fall back to the ordinary z-score
+    median = _nan_quiet(np.nanmedian, values, axis=0)
+    mad = _nan_quiet(np.nanmedian, np.abs(values - median), axis=0)
+    scale = MAD_SCALE * mad
+    std = _nan_quiet(np.nanstd, values, axis=0, ddof=1)
+    scale = np.where(scale > 0, scale, std)
+    return _nan_quiet(np.divide, values - median, scale)
+
+
+class Volatility:
+    """Monthly returns, volatility and spike flags of every market price series.
+
+    The per-market table is pivoted once into dense months x series matrices,
+    so every statistic is one array operation over all series together.
+    """
+
+    def __init__(self, market_table):
+        # Series are numbered in order of first appearance
+        series_ids = (
+            market_table.groupby(SERIES_DIMENSIONS, observed=True, sort=False)
+            .ngroup()
+            .to_numpy()
+        )
+        first = np.unique(series_ids, return_index=True)[1]
+        self.series = market_table[SERIES_DIMENSIONS].iloc[first].reset_index(drop=True)
+
+        months = market_table["month"]
+        self.months = pd.date_range(months.min(), months.max(), freq="MS")
+        month_ids = self.months.get_indexer(months)
+
+        # Sum duplicate (series, month) rows, e.g. from separately merged releases
+        shape = (len(self.months), len(self.series))
+        cells = np.ravel_multi_index((month_ids, series_ids), shape)
+        size = shape[0] * shape[1]
+        sums = np.bincount(cells, market_table["sum"].to_numpy(), size)
+        counts = np.bincount(cells, market_table["count"].to_numpy(), size)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.prices = (sums / counts).reshape(shape)
+
+        self.returns = log_returns(self.prices)
+        self.rolling_volatility = rolling_std(self.returns)
+        self.z_scores = robust_z_scores(self.returns)
+        self.spikes = np.abs(np.nan_to_num(self.z_scores)) > SPIKE_THRESHOLD
+        self.summary = self._summarize()
+
+    def _summarize(self):
+        observed = ~np.isnan(self.prices)
+        returned = ~np.isnan(self.returns)
+        mean = _nan_quiet(np.nanmean, self.prices, axis=0)
+
+        # Rolling volatility as of each series' last observed month
+        last = len(self.months) - 1 - np.argmax(observed[::-1], axis=0)
+        columns = np.arange(len(self.series))
+
+        spike_months = np.where(self.spikes, np.arange(len(self.months))[:, None], -1)
+        last_spike = spike_months.max(axis=0)
+
+        summary = self.series.copy()
+        summary["observations"] = observed.sum(axis=0)
+        summary["returns"] = returned.sum(axis=0)
+        summary["mean_price"] = mean
+        summary["cv"] = _nan_quiet(np.nanstd, self.prices, axis=0, ddof=1) / mean
+        summary["volatility"] = _nan_quiet(np.nanstd, self.returns, axis=0, ddof=1)
+        summary["latest_volatility"] = self.rolling_volatility[last, columns]
+        summary["spikes"] = self.spikes.sum(axis=0)
+        summary["last_spike"] = pd.NaT
+        has_spike = last_spike >= 0
+        summary.loc[has_spike, "last_spike"] = self.months[last_spike[has_spike]]
+        return summary
+
+    def selection(self, filters=None):
+        return select(self.series, filters).index.to_numpy()
+
+    def spike_counts(self, filters=None, granularity="Monthly"):
+        # Number of selected market series flagged as spiking in each period
+        # (in any of its months), for the periods with at least one
+        flagged = self.spikes[:, self.selection(filters)]
+        periods = self.months.to_period(GRANULARITIES[granularity]["freq"][0])
+        periods = periods.start_time
+        starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+        counts = pd.DataFrame(
+            {
+                "Date": periods[starts],
+                "Spiking series": np.logical_or.reduceat(flagged, starts, axis=0).sum(
+                    axis=1
+                ),
+            }
+        )
+        return counts[counts["Spiking series"] > 0].reset_index(drop=True)
+
+    def most_volatile(self, filters=None, measure="volatility", n=10):
+        # Individual market series with enough history, most volatile first
+        summary = self.summary.iloc[self.selection(filters)]
+        summary = summary[summary["returns"] >= MIN_RETURNS]
+        return summary.nlargest(n, measure)
+
+    def commodity_volatility(self, filters=None, measure="volatility"):
+        # Median of each commodity's market series, so commodities with many
+        # markets are not ranked on their single most erratic one
+        summary = self.summary.iloc[self.selection(filters)]
+        summary = summary[summary["returns"] >= MIN_RETURNS]
+        by_commodity = summary.groupby("#item+name", observed=True).agg(
+            volatility=("volatility", "median"),
+            cv=("cv", "median"),
+            series=("volatility", "size"),
+            spikes=("spikes", "sum"),
+        )
+        return by_commodity.sort_values(measure, ascending=False).reset_index()
@@ -0,0 +1,137 @@
+import streamlit as st
+
+from utils.cohorts import COHORT_DIMENSIONS
+from utils.normalize import CPI_BASE_YEAR, PRICE_BASES
+from utils.quantiles import RELATIVE_ACCURACY
+
+
+def sidebar_filters(cube):
+    # Sidebar filters with "ALL" option
+    region_options = ["ALL"] + sorted(cube["#adm1+name"].unique())
+    commodity_options = ["ALL"] + sorted(cube["#item+name"].unique())
+
+    # Allow multiselect for Regions and Commodities with "ALL" option
+    regions_selected = st.sidebar.multiselect(
+        "Select Region",
+        region_options,
+        default="ALL",
+        help="Filter report to show all regions or select multiple regions",
+    )
+
+    commodities_selected = st.sidebar.multiselect(
+        "Select Commodity",
+        commodity_options,
+        default="ALL",
+        help="Filter report to show all commodities or select multiple commodities",
+    )
+
+    # Filters keyed by dataset column; None keeps every value
+    filters = {
+        "#adm1+name": None if "ALL" in regions_selected else regions_selected,
+        "#item+name": None if "ALL" in commodities_selected else commodities_selected,
+    }
+    return regions_selected, commodities_selected, filters
+
+
+def price_basis_selector():
+    # Each basis has its own precomputed cube, so switching costs no more than a filter
+    basis = st.sidebar.radio(
+        "Prices",
+        list(PRICE_BASES),
+        help="Average prices as reported, per kilogram, litre or piece, or per "
+        f"standard unit in constant {CPI_BASE_YEAR} pesos",
+    )
+    return PRICE_BASES[basis]
+
+
+def price_basis_caption(value_column):
+    if value_column == "#value+std":
+        return "Prices per kilogram, litre, piece or other standard unit."
+    if value_column == "#value+std+real":
+        return (
+            f"Prices per standard unit, adjusted for inflation to {CPI_BASE_YEAR} pesos "
+            "with an approximate bundled CPI table."
+        )
+    return "Prices as reported, in each commodity's own unit."
+
+
+def exact_statistics_toggle():
+    return st.sidebar.toggle(
+        "Exact statistics",
+        help="Compute percentiles and medians from every row instead of the "
+        "quantile sketch, for audits",
+    )
+
+
+def error_bound_caption(exact):
+    if exact:
+        return "Exact value"
+    return f"Estimate within ±{RELATIVE_ACCURACY:.0%} of the exact value"
+
+
+COHORT_LABELS = {
+    "#adm1+name": "Regions",
+    "#item+name": "Commodities",
+    "#item+price+type": "Price types",
+}
+
+
+def cohort_caption(filters):
+    return "; ".join(
+        f"{label}: {', '.join(filters.get(column) or ['all'])}"
+        for column, label in COHORT_LABELS.items()
+    )
+
+
+def untaken_cohort_name(cohorts):
+    # First "Cohort N" from the number of cohorts up that no cohort is called
+    number = len(cohorts) + 1
+    while f"Cohort {number}" in cohorts:
+        number += 1
+    return f"Cohort {number}"
+
+
+def cohort_editor(cube, defaults):
+    # Named cohorts kept for the session; an empty selection keeps every value
+    cohorts = st.session_state.setdefault("cohorts", dict(defaults))
+
+    with st.sidebar.form("add_cohort", clear_on_submit=True):
+        st.markdown("**Add a cohort**")
+        fallback = untaken_cohort_name(cohorts)
+        name = st.text_input("Name", placeholder=fallback)
+        selections = {
+            column: st.multiselect(
+                label,
+                sorted(cube[column].unique()),
+                help=f"Leave empty to include all {label.lower()}",
+            )
+            for column, label in COHORT_LABELS.items()
+        }
+        if st.form_submit_button("Add cohort"):
+            name = name.strip() or fallback
+            # Adding under a taken name would silently replace that cohort
+            if name in cohorts:
+                st.warning(f"A cohort named {name} already exists; pick another name.")
+            else:
+                cohorts[name] = {
+                    column: selections[column] or None for column in COHORT_DIMENSIONS
+                }
+
+    def reset():
+        cohorts.clear()
+        cohorts.update(defaults)
+
+    # Removals run as callbacks, before the list below is drawn
+    st.sidebar.markdown("**Cohorts**")
+    for name, filters in cohorts.items():
+        c1, c2 = st.sidebar.columns([4, 1])
+        c1.markdown(f"{name}  \n:gray[{cohort_caption(filters)}]")
+        c2.button(
+            "✕",
+            key=f"remove_cohort_{name}",
+            help=f"Remove {name}",
+            on_click=cohorts.pop,
+            args=(name,),
+        )
+    st.sidebar.button("Reset to island groups", on_click=reset)
+    return cohorts